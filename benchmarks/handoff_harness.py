@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# benchmarks/handoff_harness.py
+"""Проверка updater.py --handoff на локальном bare-репозитории без Telegram.
+
+Создает во временном каталоге bare-репозиторий (origin), клон разработчика и
+рабочий клон бота. Вместо bot.py выкладывается заглушка, которая проходит тот же
+протокол передачи (utils/handoff.py), а затем несколько ревизий по очереди
+выкатываются через WiseacreUpdater.handoff_update:
+
+- первая ревизия запускается с нуля;
+- каждая следующая принимает работу у предыдущей, старый процесс завершается;
+- ревизия, которая падает при импорте, не трогает работающий бот;
+- старые worktree в .deploy удаляются.
+
+    python -m benchmarks.handoff_harness
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from updater import DEPLOY_DIR, WiseacreUpdater  # noqa: E402
+from utils.handoff import STATE_FILE, pid_alive, read_state  # noqa: E402
+
+STUB_BOT = '''#!/usr/bin/env python3
+import asyncio
+import os
+import signal
+from utils.handoff import announce_serving, clear_state, wait_for_predecessor
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSION = "{version}"
+{broken}
+
+class App:
+    running = False
+    updater = None
+
+
+async def serve():
+    app = App()
+    loop = asyncio.get_running_loop()
+    loop.create_task(announce_serving(app, CODE_DIR))
+    app.running = True
+    print("serving", VERSION, os.getpid(), flush=True)
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+    clear_state()
+    print("stopped", VERSION, flush=True)
+
+
+if __name__ == "__main__":
+    wait_for_predecessor(CODE_DIR)
+    asyncio.run(serve())
+'''
+
+
+def git(cwd: str, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.name=harness", "-c", "user.email=harness@localhost", *args],
+        cwd=cwd, capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip()
+
+
+def publish(dev_dir: str, version: str, broken: bool = False) -> str:
+    """Коммитит заглушку нужной версии в клон разработчика и отправляет в origin"""
+    with open(os.path.join(dev_dir, "bot.py"), "w", encoding="utf-8") as f:
+        f.write(STUB_BOT.format(version=version, broken="raise RuntimeError('broken revision')" if broken else ""))
+    git(dev_dir, "add", "-A")
+    git(dev_dir, "commit", "-q", "-m", f"stub bot {version}")
+    git(dev_dir, "push", "-q", "origin", "HEAD:main")
+    return git(dev_dir, "rev-parse", "HEAD")
+
+
+def setup(workdir: str) -> (str, str):
+    origin = os.path.join(workdir, "origin.git")
+    dev_dir = os.path.join(workdir, "dev")
+    live_dir = os.path.join(workdir, "live")
+    git(workdir, "init", "-q", "--bare", origin)
+    git(workdir, "init", "-q", dev_dir)
+    os.makedirs(os.path.join(dev_dir, "utils"))
+    shutil.copy(os.path.join(REPO_ROOT, "utils", "handoff.py"), os.path.join(dev_dir, "utils", "handoff.py"))
+    open(os.path.join(dev_dir, "utils", "__init__.py"), "w").close()
+    with open(os.path.join(dev_dir, "requirements.txt"), "w", encoding="utf-8") as f:
+        f.write("# заглушке зависимости не нужны\n")
+    with open(os.path.join(dev_dir, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("data/\n.deploy/\n__pycache__/\n")
+    git(dev_dir, "remote", "add", "origin", origin)
+    publish(dev_dir, "v1")
+    git(workdir, "clone", "-q", "--branch", "main", origin, live_dir)
+    return dev_dir, live_dir
+
+
+def serving(live_dir: str) -> Optional[dict]:
+    state = read_state(os.path.join(live_dir, STATE_FILE))
+    return state if state and pid_alive(state.get("pid", 0)) else None
+
+
+def run(workdir: str, timeout: float) -> List[str]:
+    """Возвращает список ошибок; пустой — передача работает"""
+    dev_dir, live_dir = setup(workdir)
+    updater = WiseacreUpdater(live_dir)
+    # Заглушке не нужны пакеты бота: проверяется только передача работы
+    updater.required_packages = {}
+    errors: List[str] = []
+
+    def deploy(label: str, expect_success: bool, sha: str, previous: Optional[dict]) -> Optional[dict]:
+        started = time.perf_counter()
+        success = updater.handoff_update(remote="origin", branch="main", timeout=timeout)
+        elapsed = time.perf_counter() - started
+        state = serving(live_dir)
+        print(f"[{label}] handoff {'ok' if success else 'failed'} за {elapsed:.2f} с, состояние: {state}")
+        if success != expect_success:
+            errors.append(f"{label}: ожидался {'успех' if expect_success else 'отказ'}")
+        if state is None:
+            errors.append(f"{label}: ни один бот не обслуживает обновления")
+            return None
+        expected_dir = os.path.join(live_dir, DEPLOY_DIR, sha[:12]) if expect_success else previous["code_dir"]
+        if state["code_dir"] != expected_dir:
+            errors.append(f"{label}: работает {state['code_dir']}, ожидался {expected_dir}")
+        if expect_success and previous and pid_alive(previous["pid"]):
+            errors.append(f"{label}: старый процесс {previous['pid']} не завершился")
+        return state
+
+    state = None
+    try:
+        sha = git(dev_dir, "rev-parse", "HEAD")
+        state = deploy("v1", True, sha, None)
+        for version in ("v2", "v3"):
+            if state is None:
+                break
+            state = deploy(version, True, publish(dev_dir, version), state)
+        if state is not None:
+            state = deploy("broken", False, publish(dev_dir, "v4", broken=True), state) or state
+        worktrees = [name for name in os.listdir(os.path.join(live_dir, DEPLOY_DIR))
+                     if os.path.isdir(os.path.join(live_dir, DEPLOY_DIR, name))]
+        print(f"Worktree в {DEPLOY_DIR}: {worktrees}")
+        # Остается работающая ревизия и, возможно, неудачная, которую не удаляли
+        if len(worktrees) > 2:
+            errors.append(f"старые worktree не удалены: {worktrees}")
+    finally:
+        current = serving(live_dir)
+        if current:
+            updater.stop_process(current["pid"], timeout)
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timeout", type=float, default=20.0, help="секунд на каждый шаг передачи")
+    parser.add_argument("--keep", action="store_true", help="не удалять временный каталог")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="wiseacre-handoff-")
+    try:
+        errors = run(workdir, args.timeout)
+    finally:
+        if args.keep:
+            print(f"Каталог стенда: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    for error in errors:
+        print(f"[!] {error}")
+    print("Передача работы: OK" if not errors else f"Передача работы: {len(errors)} ошибок")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
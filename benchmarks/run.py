@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# benchmarks/run.py
+"""Бенчмарки горячих путей бота на синтетических данных.
+
+Каждый сценарий печатает пропускную способность, p50/p99 задержки и пиковую
+память на этапе загрузки. Результат — JSON, который можно сравнить с
+предыдущим прогоном через --compare.
+
+    python -m benchmarks.run --sizes 1000 100000 --calls 5000 --output bench.json
+    python -m benchmarks.run --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Стенд меряет сам бот: лимиты Bot API, пользователей и склейка ответов выключены
+for name, value in (("API_OVERALL_RATE", "0"), ("RATE_LIMIT_BURST", "1000000000"), ("DEDUPE_WINDOW", "0")):
+    os.environ.setdefault(name, value)
+
+from benchmarks.stub_transport import StubRequest, make_update, percentiles  # noqa: E402
+from benchmarks.synthetic import student_ids, text_stream, write_roster, write_schedule  # noqa: E402
+
+
+def _measure(calls: int, operation: Callable[[int], object]) -> Dict:
+    samples: List[float] = []
+    begin = time.perf_counter()
+    for i in range(calls):
+        started = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - started)
+    elapsed = time.perf_counter() - begin
+    return {
+        "calls": calls,
+        "throughput_ops": round(calls / elapsed, 1) if elapsed else 0.0,
+        **percentiles(samples),
+    }
+
+
+def _traced(setup: Callable[[], object]):
+    """Выполняет setup и возвращает (результат, время, пиковая память в МБ)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = setup()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, round(elapsed, 4), round(peak / 1024 / 1024, 2)
+
+
+def bench_database(size: int, calls: int) -> Dict:
+    from database import StudentDatabase
+
+    data_file = f"data/roster_{size}.txt"
+    ids = write_roster(data_file, size)
+    missing = student_ids(calls, offset=size)
+
+    def load():
+        db = StudentDatabase(data_file)
+        db.get_student_count()
+        return db
+
+    db, load_s, peak_mb = _traced(load)
+    rng = random.Random(size)
+    user = SimpleNamespace(id=1, username="bench", first_name=None, last_name=None)
+
+    def authenticate(i: int):
+        student_id = missing[i] if i % 10 == 0 else rng.choice(ids)
+        db.authenticate_student(student_id, user)
+
+    result = _measure(calls, authenticate)
+    db.close()
+    return {"name": f"database.authenticate_student[{size}]", "load_s": load_s, "peak_memory_mb": peak_mb, **result}
+
+
+def bench_hashing(calls: int) -> List[Dict]:
+    """Стоимость схем хеширования: старый SHA-256, HMAC без кэша и с кэшем"""
+    from utils import hashing
+
+    ids = student_ids(calls)
+    hot = ids[:64]
+    uncached = getattr(hashing.hash_student_id, "__wrapped__", hashing.hash_student_id)
+    hashing.hash_student_id.cache_clear()
+    return [
+        {"name": "hashing.legacy_sha256", **_measure(calls, lambda i: hashing.legacy_hash(ids[i]))},
+        {"name": f"hashing.{hashing.HASH_SCHEME}.uncached", **_measure(calls, lambda i: uncached(ids[i]))},
+        {"name": f"hashing.{hashing.HASH_SCHEME}.cached", **_measure(calls, lambda i: hashing.hash_student_id(hot[i % len(hot)]))},
+    ]
+
+
+def bench_schedule(calls: int) -> List[Dict]:
+    from utils.schedule_manager import ScheduleManager
+
+    schedule_file = write_schedule("data/bench_schedule.json")
+    manager, load_s, peak_mb = _traced(lambda: ScheduleManager(schedule_file, groups_dir="data/none"))
+    rng = random.Random(0)
+    start = manager.start_date
+    dates = [start + timedelta(days=rng.randint(-60, 220)) for _ in range(calls)]
+    texts = [d.strftime("%d.%m.%Y") for d in dates]
+    lessons = manager.get_day_schedule(start)
+
+    by_date = _measure(calls, lambda i: manager.get_schedule_for_date(texts[i]))
+    formatted = _measure(calls, lambda i: manager.format_schedule(lessons, dates[i]))
+    return [
+        {"name": "schedule.get_schedule_for_date", "load_s": load_s, "peak_memory_mb": peak_mb, **by_date},
+        {"name": "schedule.format_schedule", **formatted},
+    ]
+
+
+def bench_logger(calls: int) -> Dict:
+    from utils.logger import UserLogger
+
+    user_logger, load_s, peak_mb = _traced(lambda: UserLogger("data/bench_logs"))
+    users = [SimpleNamespace(id=i, username=f"student{i}") for i in range(500)]
+    result = _measure(calls, lambda i: user_logger.log_message(users[i % len(users)], "MESSAGE", "расписание"))
+    started = time.perf_counter()
+    user_logger.close()
+    result["drain_s"] = round(time.perf_counter() - started, 4)
+    return {"name": "logger.log_message", "load_s": load_s, "peak_memory_mb": peak_mb, **result}
+
+
+async def _drive(app, updates: List[Dict]) -> Dict:
+    from telegram import Update
+
+    samples: List[float] = []
+    async with app:
+        begin = time.perf_counter()
+        for data in updates:
+            started = time.perf_counter()
+            await app.process_update(Update.de_json(data, app.bot))
+            samples.append(time.perf_counter() - started)
+        elapsed = time.perf_counter() - begin
+    return {
+        "calls": len(updates),
+        "throughput_ops": round(len(updates) / elapsed, 1) if elapsed else 0.0,
+        **percentiles(samples),
+    }
+
+
+def bench_handlers(calls: int, roster_size: int) -> List[Dict]:
+    from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+
+    ids = write_roster("data/allowed_students.txt", roster_size)
+
+    import bot
+    from handlers import auth
+
+    texts = list(text_stream(calls, ids))
+    updates = [make_update(i + 1, 2_000_000 + i % 1000, text) for i, text in enumerate(texts)]
+    request = StubRequest()
+
+    bot_app = bot.build_application("123456:STUB", request=request)
+    auth_app = (
+        ApplicationBuilder().token("123456:STUB").request(request).get_updates_request(request).build()
+    )
+    auth_app.add_handler(CommandHandler("start", auth.start_command))
+    auth_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, auth.handle_student_id))
+
+    results = [
+        {"name": "handlers.bot", **asyncio.run(_drive(bot_app, updates))},
+        {"name": "handlers.auth", **asyncio.run(_drive(auth_app, updates))},
+    ]
+    auth.logger.close()
+    return results
+
+
+def compare(current: List[Dict], baseline_file: str):
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {item["name"]: item for item in json.load(f)["results"]}
+    for item in current:
+        old = baseline.get(item["name"])
+        if not old:
+            continue
+        ratios = []
+        for key in ("p50_ms", "p99_ms"):
+            if old.get(key):
+                ratios.append(f"{key} x{item[key] / old[key]:.2f}")
+        print(f"{item['name']}: {', '.join(ratios)}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--calls", type=int, default=2_000)
+    parser.add_argument("--only", nargs="+", choices=["hashing", "database", "schedule", "logger", "handlers"])
+    parser.add_argument("--output", help="куда сохранить JSON с результатами")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    selected = set(args.only or ["hashing", "database", "schedule", "logger", "handlers"])
+    invocation_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="wiseacre-bench-"))
+    write_schedule("data/schedule.json")
+    os.makedirs("data/schedules", exist_ok=True)
+
+    results: List[Dict] = []
+    if "hashing" in selected:
+        results.extend(bench_hashing(args.calls))
+    if "database" in selected:
+        results.extend(bench_database(size, args.calls) for size in args.sizes)
+    if "schedule" in selected:
+        results.extend(bench_schedule(args.calls))
+    if "logger" in selected:
+        results.append(bench_logger(args.calls))
+    if "handlers" in selected:
+        results.extend(bench_handlers(args.calls, min(args.sizes)))
+
+    report = {
+        "python": platform.python_version(),
+        "date": date.today().isoformat(),
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(os.path.join(invocation_dir, args.output), "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare:
+        compare(results, os.path.join(invocation_dir, args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# benchmarks/stub_transport.py
+
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {
+    "id": 100000001,
+    "is_bot": True,
+    "first_name": "WISEACRE",
+    "username": "wiseacre_stub_bot",
+}
+
+
+class StubRequest(BaseRequest):
+    """Транспорт Bot API, который отвечает сам и не ходит в Telegram"""
+
+    def __init__(self, on_send: Optional[Callable[[str, Dict], None]] = None):
+        self.on_send = on_send
+        self.calls: Dict[str, int] = {}
+        self._message_id = 0
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return 5.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        result = self._result(api_method, params)
+        if self.on_send is not None:
+            self.on_send(api_method, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def _result(self, api_method: str, params: Dict):
+        if api_method == "getMe":
+            return BOT_USER
+        if api_method in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": params.get("chat_id", 0), "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        if api_method == "getUpdates":
+            return []
+        return True
+
+
+def make_update(update_id: int, user_id: int, text: str, username: Optional[str] = None) -> Dict:
+    """Синтетическое обновление Telegram с текстовым сообщением в личном чате"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"Student{user_id}"}
+    if username:
+        user["username"] = username
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p99/максимум в миллисекундах"""
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# benchmarks/synthetic.py
+
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+SUBJECTS = ["Матанализ", "Физика", "Программирование", "История", "Английский", "Химия"]
+TYPES = ["Лекция", "Практика", "Лабораторная"]
+TEACHERS = ["Иванов И.И.", "Петрова А.С.", "Сидоров П.П.", "Кузнецова Е.В.", "Смирнов Д.А."]
+TIMES = ["09:00-10:30", "10:40-12:10", "12:40-14:10", "14:20-15:50", "16:00-17:30"]
+WORKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday"]
+
+
+def _week(rng: random.Random) -> Dict[str, List[Dict]]:
+    return {
+        day: [
+            {
+                "time": time_slot,
+                "subject": rng.choice(SUBJECTS),
+                "type": rng.choice(TYPES),
+                "room": str(rng.randint(100, 599)),
+                "teacher": rng.choice(TEACHERS),
+            }
+            for time_slot in TIMES[: rng.randint(0, len(TIMES))]
+        ]
+        for day in WORKDAYS
+    }
+
+
+def make_schedule(start: date = date(2025, 9, 1), weeks: int = 18, seed: int = 0) -> Dict:
+    """Семестровое расписание: чётная/нечётная недели и несколько особых дат"""
+    rng = random.Random(seed)
+    special = {
+        (start + timedelta(days=rng.randint(0, weeks * 7))).isoformat(): []
+        for _ in range(5)
+    }
+    return {
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(weeks=weeks)).isoformat(),
+        "odd_week": _week(rng),
+        "even_week": _week(rng),
+        "special_dates": special,
+    }
+
+
+def write_schedule(path: str, **kwargs) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(make_schedule(**kwargs), f, ensure_ascii=False)
+    return path
+
+
+def student_ids(size: int, offset: int = 0) -> List[str]:
+    """Номера студбилетов вида 8-значных чисел"""
+    return [f"{10_000_000 + offset + i}" for i in range(size)]
+
+
+def write_roster(path: str, size: int, occupied_ratio: float = 0.1, seed: int = 0) -> List[str]:
+    """Пишет снимок allowed_students.txt в текущей схеме хеширования и возвращает номера"""
+    from utils.hashing import HASH_SCHEME, hash_many
+
+    rng = random.Random(seed)
+    ids = student_ids(size)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for student_hash in hash_many(ids):
+            status = "занят@bench" if rng.random() < occupied_ratio else "свободен"
+            f.write(f"{student_hash}:{status}\n")
+    with open(f"{path}.scheme", "w", encoding="utf-8") as f:
+        f.write(f"{HASH_SCHEME}\n")
+    return ids
+
+
+def text_stream(count: int, ids: List[str], seed: int = 0) -> Iterator[str]:
+    """Смесь типичных сообщений: команды, запросы расписания и студбилеты"""
+    rng = random.Random(seed)
+    templates = ["/start", "/help", "/raspisanie", "расписание", "расписание 15.12.2025", "привет"]
+    for _ in range(count):
+        if ids and rng.random() < 0.3:
+            yield rng.choice(ids)
+        else:
+            yield rng.choice(templates)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# benchmarks/webhook_harness.py
+"""Нагрузочный стенд для режима webhook без обращения к Telegram.
+
+Поднимает приложение из bot.py с заглушкой транспорта Bot API, запускает
+встроенный webhook-сервер и отправляет на него синтетические Update по HTTP.
+Задержка считается от начала POST до вызова sendMessage для того же чата.
+
+    python -m benchmarks.webhook_harness --updates 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Стенд меряет сам бот: лимиты Bot API, пользователей и склейка ответов выключены
+for name, value in (("API_OVERALL_RATE", "0"), ("RATE_LIMIT_BURST", "1000000000"), ("DEDUPE_WINDOW", "0")):
+    os.environ.setdefault(name, value)
+
+from benchmarks.stub_transport import StubRequest, make_update, percentiles  # noqa: E402
+from benchmarks.synthetic import write_schedule  # noqa: E402
+
+TEXTS = ["/raspisanie", "расписание", "расписание 15.12.2025", "/help"]
+
+
+async def _post_worker(
+    port: int, path: str, secret: str, jobs: "asyncio.Queue", started: Dict[int, float]
+):
+    """Шлет обновления по одному keep-alive соединению"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while True:
+            update = await jobs.get()
+            if update is None:
+                return
+            body = json.dumps(update).encode("utf-8")
+            request = (
+                f"POST /{path} HTTP/1.1\r\n"
+                f"Host: 127.0.0.1:{port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode("ascii") + body
+            started[update["message"]["chat"]["id"]] = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+    finally:
+        writer.close()
+
+
+async def run(updates: int, concurrency: int, port: int) -> Dict:
+    import bot
+
+    path, secret = "telegram", "harness-secret"
+    started: Dict[int, float] = {}
+    latencies: List[float] = []
+    done = asyncio.Event()
+
+    def on_send(api_method: str, params: Dict):
+        if api_method != "sendMessage":
+            return
+        begin = started.pop(params.get("chat_id"), None)
+        if begin is not None:
+            latencies.append(time.perf_counter() - begin)
+            if len(latencies) >= updates:
+                done.set()
+
+    app = bot.build_application("123456:STUB", request=StubRequest(on_send))
+    async with app:
+        # post_init вызывается только из run_webhook/run_polling, поэтому сервисы стартуем сами
+        await bot.start_services()
+        await app.updater.start_webhook(
+            listen="127.0.0.1",
+            port=port,
+            url_path=path,
+            webhook_url=f"http://127.0.0.1:{port}/{path}",
+            secret_token=secret,
+        )
+        await app.start()
+
+        jobs: "asyncio.Queue" = asyncio.Queue()
+        for i in range(updates):
+            jobs.put_nowait(make_update(i + 1, 1_000_000 + i, TEXTS[i % len(TEXTS)]))
+        for _ in range(concurrency):
+            jobs.put_nowait(None)
+
+        begin = time.perf_counter()
+        await asyncio.gather(
+            *(_post_worker(port, path, secret, jobs, started) for _ in range(concurrency))
+        )
+        try:
+            await asyncio.wait_for(done.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - begin
+
+        await app.updater.stop()
+        await app.stop()
+
+    return {
+        "updates": updates,
+        "replied": len(latencies),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--workdir", help="каталог с data/ (по умолчанию временный с синтетикой)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="wiseacre-harness-")
+    if not args.workdir:
+        write_schedule(os.path.join(workdir, "data", "schedule.json"))
+    os.chdir(workdir)
+
+    result = asyncio.run(run(args.updates, args.concurrency, args.port))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
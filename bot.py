@@ -1,28 +1,72 @@
 #!/usr/bin/env python3
 
+import argparse
+import asyncio
 import logging
-from telegram import Update
+from datetime import datetime, time, timedelta
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
 from telegram.ext import (
+    AIORateLimiter,
     ApplicationBuilder,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters,
     CallbackContext,
 )
-from utils.schedule_manager import schedule_manager
+from database import db, lock_storage
+from handlers import auth
+from handlers.router import parse_date_argument, parse_week_argument, router
+from utils.broadcast import EVENING, MORNING, broadcast_job
+from utils.handoff import announce_serving, clear_state, wait_for_predecessor
+from utils.metrics import instrument_handler, metrics, start_metrics_server
+from utils.persistence import JournalPersistence
+from utils.rate_limit import ResponseDeduplicator, TokenBucketLimiter
+from utils.schedule_manager import MOSCOW_TZ, GroupSchedule, schedule_manager
+from utils.startup import profile_startup, start_services
+from utils.update_processor import PerChatUpdateProcessor
+from config import (
+    API_GROUP_RATE,
+    API_OVERALL_RATE,
+    BOT_MODE,
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_EVENING_TIME,
+    BROADCAST_MORNING_TIME,
+    CONCURRENT_UPDATES,
+    DEDUPE_WINDOW,
+    INLINE_CACHE_TIME,
+    METRICS_HOST,
+    METRICS_PORT,
+    PERSISTENCE_FILE,
+    PERSISTENCE_INTERVAL,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_RATE,
+    SCHEDULE_RELOAD_INTERVAL,
+    WORKERS,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+# /days: сколько дней по умолчанию и максимум
+DAYS_DEFAULT = 3
+DAYS_LIMIT = 14
 
 
+@instrument_handler
 async def start_command(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
     await update.message.reply_text(
@@ -33,52 +77,433 @@ async def start_command(update: Update, context: CallbackContext) -> None:
     )
 
 
+@instrument_handler
 async def help_command(update: Update, context: CallbackContext) -> None:
     help_text = (
         "📘 Доступные команды:\n"
         "/start — запустить бота\n"
         "/help — список команд\n"
         "/raspisanie — показать пары на сегодня\n"
-        "Или просто напиши: расписание или расписание 15.12.2025"
+        "/week — пары на неделю (/week следующая, /week чётная)\n"
+        "/next — текущая и следующая пара\n"
+        "/days 5 — пары на несколько дней вперед\n"
+        "/room 305 — занята ли аудитория и когда в ней пары\n"
+        "/teacher Иванов — ближайшие пары преподавателя\n"
+        "/group ИВТ-21 — выбрать свою группу\n"
+        "/subscribe — присылать расписание на завтра каждый вечер "
+        "(/subscribe утро — на сегодня по утрам)\n"
+        "/unsubscribe — отписаться от рассылки\n"
+        "Или просто напиши: расписание, расписание завтра, расписание пятница, "
+        "расписание 15.12 или расписание 15.12.2025, неделя, следующая неделя, "
+        "следующая пара, пары на 5 дней\n"
+        "В любом чате: @имя_бота завтра или @имя_бота неделя"
     )
     await update.message.reply_text(help_text)
 
 
-async def schedule_command(update: Update, context: CallbackContext) -> None:
-    user_input = context.args
-    if not user_input:
-        message = schedule_manager.get_today_schedule()
+@instrument_handler
+async def group_command(update: Update, context: CallbackContext) -> None:
+    """Привязывает пользователя к расписанию группы"""
+    if not context.args:
+        current = context.user_data.get("group") or "не выбрана"
+        await update.message.reply_text(f"👥 Текущая группа: {current}\nЧтобы сменить: /group ИВТ-21")
+        return
+    group = context.args[0]
+    if not schedule_manager.has_group(group):
+        await update.message.reply_text(f"⚠️ Расписание группы {group} не найдено")
+        return
+    context.user_data["group"] = group
+    await update.message.reply_text(f"✅ Группа {group} выбрана")
+
+
+SUBSCRIPTION_MODES = {"утро": MORNING, "вечер": EVENING}
+SUBSCRIPTION_TIMES = {MORNING: BROADCAST_MORNING_TIME, EVENING: BROADCAST_EVENING_TIME}
+
+
+@instrument_handler
+async def subscribe_command(update: Update, context: CallbackContext) -> None:
+    """Включает ежедневную рассылку расписания в личный чат"""
+    if update.effective_chat.type != "private":
+        await update.message.reply_text("⚠️ Рассылка доступна только в личном чате с ботом")
+        return
+    choice = context.args[0].lower() if context.args else "вечер"
+    mode = SUBSCRIPTION_MODES.get(choice)
+    if mode is None:
+        await update.message.reply_text("⚠️ Укажи время рассылки: /subscribe утро или /subscribe вечер")
+        return
+    if not SUBSCRIPTION_TIMES[mode]:
+        await update.message.reply_text("⚠️ Эта рассылка сейчас выключена")
+        return
+    context.user_data["subscription"] = mode
+    day = "сегодня" if mode == MORNING else "завтра"
+    await update.message.reply_text(
+        f"🔔 Буду присылать расписание на {day} каждый день в {SUBSCRIPTION_TIMES[mode]}"
+    )
+
+
+@instrument_handler
+async def unsubscribe_command(update: Update, context: CallbackContext) -> None:
+    if context.user_data.pop("subscription", None) is None:
+        await update.message.reply_text("Ты не подписан на рассылку")
     else:
-        date_str = user_input[0]
-        message = schedule_manager.get_schedule_for_date(date_str)
-    await update.message.reply_text(message)
-
-
-async def schedule_text(update: Update, context: CallbackContext) -> None:
-    """Реакция на сообщение, содержащее слово 'расписание'"""
-    text = update.message.text.lower().strip()
-    if text.startswith("расписание"):
-        parts = text.split()
-        if len(parts) == 2:
-            message = schedule_manager.get_schedule_for_date(parts[1])
-        else:
-            message = schedule_manager.get_today_schedule()
+        await update.message.reply_text("🔕 Рассылка отключена")
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes), tzinfo=MOSCOW_TZ)
+
+
+limiter = TokenBucketLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+deduplicator = ResponseDeduplicator(DEDUPE_WINDOW)
+
+
+def _is_rate_limited(update: Update) -> bool:
+    """Проверяет лимит пользователя, а в групповых чатах — еще и лимит чата"""
+    user, chat = update.effective_user, update.effective_chat
+    allowed = user is None or limiter.allow(("user", user.id))
+    if allowed and chat is not None and chat.type != "private":
+        allowed = limiter.allow(("chat", chat.id))
+    if not allowed:
+        metrics.dropped_requests.inc("rate_limit")
+    return not allowed
+
+
+async def _reply_schedule(update: Update, context: CallbackContext, argument: str = None) -> None:
+    if _is_rate_limited(update):
+        return
+    target_date = parse_date_argument(argument, datetime.now(MOSCOW_TZ).date())
+    group = context.user_data.get("group")
+
+    async def respond():
+        message = await _schedule_message(context, target_date)
         await update.message.reply_text(message)
 
+    key = (update.effective_chat.id, target_date, group)
+    if not await deduplicator.run(key, respond):
+        metrics.dropped_requests.inc("duplicate")
 
-def main():
-    if not TOKEN:
-        raise ValueError("❌ Токен не найден! Укажи BOT_TOKEN в .env")
 
-    app = ApplicationBuilder().token(TOKEN).build()
+async def _group_schedule(context: CallbackContext) -> GroupSchedule:
+    """Расписание группы пользователя; KeyError, если файл группы пропал"""
+    group = context.user_data.get("group")
+    if group and not schedule_manager.is_loaded(group):
+        # Разбор JSON группы блокирующий — загружаем в пуле потоков
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, schedule_manager.get_group, group)
+    return schedule_manager.get_group(group)
+
+
+def _group_missing(context: CallbackContext) -> str:
+    group = context.user_data.pop("group", None)
+    return f"⚠️ Расписание группы {group} больше недоступно, выбери группу заново: /group"
+
+
+async def _schedule_message(context: CallbackContext, target_date) -> str:
+    if target_date is None:
+        return "⚠️ Неверный формат даты. Примеры: завтра, пятница, 31.10 или 31.10.2025"
+    try:
+        schedule = await _group_schedule(context)
+    except KeyError:
+        return _group_missing(context)
+    return schedule.get_schedule_for_day(target_date)
+
+
+def _week_date(schedule: GroupSchedule, choice, today):
+    """Любой день нужной недели: сдвиг от текущей или ближайшая неделя заданной четности"""
+    if isinstance(choice, int):
+        return today + timedelta(weeks=choice)
+    monday = today - timedelta(days=today.weekday())
+    if schedule.get_week_type(monday) != choice:
+        monday += timedelta(weeks=1)
+    return monday
+
+
+async def _week_message(context: CallbackContext, argument: str = None) -> str:
+    choice = parse_week_argument(argument)
+    if choice is None:
+        return "⚠️ Не понял, какая неделя. Примеры: неделя, следующая неделя, чётная неделя"
+    try:
+        schedule = await _group_schedule(context)
+    except KeyError:
+        return _group_missing(context)
+    today = datetime.now(MOSCOW_TZ).date()
+    return schedule.get_week_message(_week_date(schedule, choice, today))
+
+
+async def _reply_week(update: Update, context: CallbackContext, argument: str = None) -> None:
+    if _is_rate_limited(update):
+        return
+
+    async def respond():
+        await update.message.reply_text(await _week_message(context, argument))
+
+    key = (update.effective_chat.id, "week", (argument or "").lower(), context.user_data.get("group"))
+    if not await deduplicator.run(key, respond):
+        metrics.dropped_requests.inc("duplicate")
+
+
+def _parse_days(argument: str = None):
+    if not argument:
+        return DAYS_DEFAULT
+    if not argument.strip().isdigit():
+        return None
+    return min(max(int(argument), 1), DAYS_LIMIT)
+
+
+async def _lookup_message(context: CallbackContext, kind: str, argument: str = None) -> str:
+    """Ответы по индексу пар: next, days, room, teacher"""
+    if kind == "days":
+        days = _parse_days(argument)
+        if days is None:
+            return f"⚠️ Укажи число дней, например: /days 5 (не больше {DAYS_LIMIT})"
+    elif kind == "room" and not argument:
+        return "⚠️ Укажи аудиторию, например: /room 305"
+    elif kind == "teacher" and not argument:
+        return "⚠️ Укажи фамилию преподавателя, например: /teacher Иванов"
+    try:
+        schedule = await _group_schedule(context)
+    except KeyError:
+        return _group_missing(context)
+    now = datetime.now(MOSCOW_TZ)
+    if kind == "next":
+        return schedule.get_next_message(now)
+    if kind == "days":
+        return schedule.get_days_message(days, now.date())
+    if kind == "room":
+        return schedule.get_room_message(argument, now)
+    return schedule.get_teacher_message(argument, now)
+
+
+async def _reply_lookup(update: Update, context: CallbackContext, kind: str, argument: str = None) -> None:
+    if _is_rate_limited(update):
+        return
+
+    async def respond():
+        await update.message.reply_text(await _lookup_message(context, kind, argument))
+
+    key = (update.effective_chat.id, kind, (argument or "").lower(), context.user_data.get("group"))
+    if not await deduplicator.run(key, respond):
+        metrics.dropped_requests.inc("duplicate")
+
+
+@instrument_handler
+async def schedule_command(update: Update, context: CallbackContext) -> None:
+    argument = " ".join(context.args) if context.args else None
+    await _reply_schedule(update, context, argument)
+
+
+@instrument_handler
+async def week_command(update: Update, context: CallbackContext) -> None:
+    argument = " ".join(context.args) if context.args else None
+    await _reply_week(update, context, argument)
+
+
+@instrument_handler
+async def next_command(update: Update, context: CallbackContext) -> None:
+    await _reply_lookup(update, context, "next")
+
+
+@instrument_handler
+async def days_command(update: Update, context: CallbackContext) -> None:
+    argument = " ".join(context.args) if context.args else None
+    await _reply_lookup(update, context, "days", argument)
+
+
+@instrument_handler
+async def room_command(update: Update, context: CallbackContext) -> None:
+    argument = " ".join(context.args) if context.args else None
+    await _reply_lookup(update, context, "room", argument)
+
+
+@instrument_handler
+async def teacher_command(update: Update, context: CallbackContext) -> None:
+    argument = " ".join(context.args) if context.args else None
+    await _reply_lookup(update, context, "teacher", argument)
+
+
+def _article(result_id: str, title: str, message: str) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=result_id,
+        title=title,
+        description=message.split("\n", 1)[0],
+        input_message_content=InputTextMessageContent(message),
+    )
+
+
+@instrument_handler
+async def inline_query(update: Update, context: CallbackContext) -> None:
+    """Inline-режим: @бот завтра, @бот неделя; пустой запрос — готовые варианты"""
+    query = update.inline_query.query.strip()
+    today = datetime.now(MOSCOW_TZ).date()
+    intent = router.match(query) if query else None
+    week_choice = target_date = None
+    if intent is not None and intent.name == "week":
+        week_choice = parse_week_argument(intent.argument)
+    elif intent is not None and intent.name == "schedule":
+        target_date = parse_date_argument(intent.argument, today)
+    elif query:
+        target_date = parse_date_argument(query, today)
+    try:
+        schedule = await _group_schedule(context)
+    except KeyError:
+        schedule = schedule_manager.get_group(None)
+
+    if week_choice is not None:
+        week_date = _week_date(schedule, week_choice, today)
+        results = [_article(f"week-{week_date.isoformat()}", "Неделя", schedule.get_week_message(week_date))]
+    elif target_date is not None:
+        results = [_article(f"day-{target_date.isoformat()}", "Расписание", schedule.get_schedule_for_day(target_date))]
+    else:
+        tomorrow = today + timedelta(days=1)
+        next_week = today + timedelta(weeks=1)
+        results = [
+            _article(f"day-{today.isoformat()}", "Сегодня", schedule.get_schedule_for_day(today)),
+            _article(f"day-{tomorrow.isoformat()}", "Завтра", schedule.get_schedule_for_day(tomorrow)),
+            _article(f"week-{today.isoformat()}", "Эта неделя", schedule.get_week_message(today)),
+            _article(f"week-{next_week.isoformat()}", "Следующая неделя", schedule.get_week_message(next_week)),
+        ]
+    # Ответ зависит от группы пользователя, поэтому кешируется Telegram отдельно для каждого
+    await update.inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+@instrument_handler
+async def route_text(update: Update, context: CallbackContext) -> None:
+    """Единая точка входа для текста: намерение уже распознано фильтром роутера"""
+    intent = router.intent_from_match(context.matches[0])
+    if intent.name == "schedule":
+        await _reply_schedule(update, context, intent.argument)
+    elif intent.name == "week":
+        await _reply_week(update, context, intent.argument)
+    elif intent.name in ("next", "days"):
+        await _reply_lookup(update, context, intent.name, intent.argument)
+    elif intent.name == "student_id" and not context.user_data.get("authenticated"):
+        # Номер студбилета принимается только в личке: в группе любое число
+        # получало бы публичный ответ, а сам номер оказывался бы на виду
+        if update.effective_chat.type != "private" or _is_rate_limited(update):
+            return
+        await auth.handle_student_id(update, context)
+
+
+async def post_init(app) -> None:
+    # Расписание, индекс базы и журнал грузятся параллельно до приема обновлений
+    timings = await start_services()
+    logger.info(
+        "Сервисы запущены: %s",
+        ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in timings.items()),
+    )
+    app.create_task(announce_serving(app, CODE_DIR))
+    if SCHEDULE_RELOAD_INTERVAL > 0:
+        app.create_task(schedule_manager.watch(SCHEDULE_RELOAD_INTERVAL))
+    if METRICS_PORT:
+        app.bot_data["metrics_server"] = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        logger.info("Метрики доступны на http://%s:%s/metrics", METRICS_HOST, METRICS_PORT)
+
+
+async def post_shutdown(app) -> None:
+    clear_state()
+    server = app.bot_data.pop("metrics_server", None)
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+def build_application(token: str, request=None, persistence_file: str = PERSISTENCE_FILE):
+    """Собирает приложение со всеми обработчиками; request позволяет подменить транспорт"""
+    builder = ApplicationBuilder().token(token).post_init(post_init).post_shutdown(post_shutdown)
+    if API_OVERALL_RATE > 0:
+        builder = builder.rate_limiter(
+            AIORateLimiter(
+                overall_max_rate=API_OVERALL_RATE,
+                group_max_rate=API_GROUP_RATE,
+                max_retries=3,
+            )
+        )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    if persistence_file:
+        builder = builder.persistence(JournalPersistence(persistence_file, PERSISTENCE_INTERVAL))
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+    app = builder.build()
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("raspisanie", schedule_command))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, schedule_text))
+    app.add_handler(CommandHandler("week", week_command))
+    app.add_handler(CommandHandler("next", next_command))
+    app.add_handler(CommandHandler("days", days_command))
+    app.add_handler(CommandHandler("room", room_command))
+    app.add_handler(CommandHandler("teacher", teacher_command))
+    app.add_handler(CommandHandler("group", group_command))
+    app.add_handler(CommandHandler("subscribe", subscribe_command))
+    app.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+    # Сообщения, не подходящие ни под одно намерение, отсекаются фильтром без вызова обработчика
+    app.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND & filters.Regex(router.pattern), route_text)
+    )
+    app.add_handler(InlineQueryHandler(inline_query))
+
+    if app.job_queue is not None:
+        for mode, at in SUBSCRIPTION_TIMES.items():
+            if at:
+                app.job_queue.run_daily(
+                    broadcast_job,
+                    _parse_time(at),
+                    data={"mode": mode, "batch_size": BROADCAST_BATCH_SIZE},
+                    name=f"broadcast-{mode}",
+                )
+    return app
+
 
-    print("🤖 Бот WISEACRE запущен...")
-    app.run_polling()
+def main():
+    parser = argparse.ArgumentParser(description="Бот WISEACRE")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="вывести время импорта и инициализации компонентов и выйти",
+    )
+    args = parser.parse_args()
+    if args.profile_startup:
+        print(profile_startup())
+        return
+
+    if not TOKEN:
+        raise ValueError("❌ Токен не найден! Укажи BOT_TOKEN в .env")
+
+    if BOT_MODE == "webhook" and WORKERS > 1:
+        if not WEBHOOK_URL:
+            raise ValueError("❌ Для режима webhook укажи WEBHOOK_URL в .env")
+        from utils.workers import run_front
+
+        print(f"🤖 Бот WISEACRE запущен (webhook на порту {WEBHOOK_PORT}, рабочих процессов: {WORKERS})...")
+        run_front(TOKEN, WORKERS)
+        return
+
+    app = build_application(TOKEN)
+    # Расписание только читается — грузим его, пока старый процесс еще отвечает.
+    # Изменяемые данные (база, user_data, журналы) — только после его выхода
+    schedule_manager.start()
+    wait_for_predecessor(CODE_DIR)
+    if not lock_storage():
+        raise RuntimeError("❌ База студбилетов занята: идет roster.py import/rehash или запущен другой экземпляр бота")
+    # С чужой схемой хешей ни один номер не найдется — лучше не стартовать вовсе
+    db.require_current_scheme()
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("❌ Для режима webhook укажи WEBHOOK_URL в .env")
+        print(f"🤖 Бот WISEACRE запущен (webhook на порту {WEBHOOK_PORT})...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        print("🤖 Бот WISEACRE запущен...")
+        app.run_polling()
 
 
 if __name__ == "__main__":
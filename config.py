@@ -5,3 +5,62 @@ load_dotenv()
 
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# Хранилище студбилетов: text (снимок + журнал) или sqlite
+DB_BACKEND = os.getenv('DB_BACKEND', 'text')
+DB_SQLITE_FILE = os.getenv('DB_SQLITE_FILE', 'data/students.sqlite3')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+# Интервал проверки data/schedule.json на изменения, секунд (0 — не следить)
+SCHEDULE_RELOAD_INTERVAL = float(os.getenv('SCHEDULE_RELOAD_INTERVAL', '5'))
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+# Публичный адрес, на который Telegram будет слать обновления: https://example.com
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+
+# Сколько обновлений обрабатывать параллельно (1 — последовательно).
+# Обновления одного чата всегда обрабатываются по порядку.
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '1'))
+
+# Эндпоинт /metrics в формате Prometheus (0 — выключен)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Секрет для HMAC-хеширования студбилетов. После смены схемы выполни
+# python roster.py rehash, чтобы перевести существующую базу.
+STUDENT_HASH_KEY = os.getenv('STUDENT_HASH_KEY', '')
+HASH_CACHE_SIZE = int(os.getenv('HASH_CACHE_SIZE', '4096'))
+
+# Файл, где между перезапусками хранится user_data (пусто — не сохранять)
+PERSISTENCE_FILE = os.getenv('PERSISTENCE_FILE', 'data/user_data.jsonl')
+PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '30'))
+
+# Ограничение запросов расписания: токенов в секунду и запас на пользователя/чат
+RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '0.5'))
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '5'))
+# Одинаковый ответ в тот же чат не отправляется повторно в течение этого окна, секунд
+DEDUPE_WINDOW = float(os.getenv('DEDUPE_WINDOW', '3'))
+# Лимиты исходящих запросов к Bot API (AIORateLimiter, 0 — выключить)
+API_OVERALL_RATE = float(os.getenv('API_OVERALL_RATE', '30'))
+API_GROUP_RATE = float(os.getenv('API_GROUP_RATE', '20'))
+
+# Ежедневная рассылка расписания подписчикам (/subscribe), время по Москве ЧЧ:ММ.
+# Утром приходят пары на сегодня, вечером — на завтра; пустое значение выключает рассылку.
+BROADCAST_MORNING_TIME = os.getenv('BROADCAST_MORNING_TIME', '07:00')
+BROADCAST_EVENING_TIME = os.getenv('BROADCAST_EVENING_TIME', '20:00')
+# Сколько сообщений рассылки отправлять в секунду (лимит Telegram — около 30)
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '25'))
+
+# Сколько секунд Telegram может кешировать ответы на inline-запросы (@бот неделя)
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+
+# Число рабочих процессов в режиме webhook (1 — один процесс). Фронт принимает
+# обновления и раздает их рабочим по user_id; базу студбилетов держит фронт.
+WORKERS = int(os.getenv('WORKERS', '1'))
+# Индекс хешей студбилетов, который рабочие читают через mmap (пересобирается при запуске)
+ROSTER_INDEX_FILE = os.getenv('ROSTER_INDEX_FILE', 'data/roster.idx')
@@ -1,16 +1,75 @@
 #!/usr/bin/env python3
 
-import hashlib
+import atexit
+import logging
 import os
-from typing import Tuple
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 from telegram import User
+from config import DB_BACKEND, DB_POOL_SIZE, DB_SQLITE_FILE
+from utils.hashing import HASH_SCHEME, hash_student_id, upgrade_hash
+from utils.lazy import LazyService
+from utils.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка хранилища недоступна
+    fcntl = None
+
+FREE_STATUS = "свободен"
+OCCUPIED_PREFIX = "занят@"
+# Занятый номер: занят@<имя>#<telegram id>; у старых записей id нет
+OWNER_ID_SEPARATOR = "#"
+LEGACY_SCHEME = "sha256"
+# Первая строка снимка: схема хеширования меняется вместе с данными одним os.replace
+SCHEME_HEADER = "#scheme:"
+
+logger = logging.getLogger(__name__)
+
+
+def occupied_by(status: str) -> str:
+    """Отображаемое имя владельца номера без id"""
+    if "@" not in status:
+        return "неизвестный пользователь"
+    owner = status.split("@", 1)[1]
+    name, separator, owner_id = owner.rpartition(OWNER_ID_SEPARATOR)
+    return name if separator and owner_id.isdigit() else owner
+
+
+def occupant_id(status: str) -> Optional[int]:
+    """Telegram id владельца номера; None для свободных и старых записей"""
+    if not status.startswith(OCCUPIED_PREFIX):
+        return None
+    _, separator, owner_id = status.rpartition(OWNER_ID_SEPARATOR)
+    return int(owner_id) if separator and owner_id.isdigit() else None
 
 
 class StudentDatabase:
-    def __init__(self, data_file: str = "data/allowed_students.txt"):
+    def __init__(
+        self,
+        data_file: str = "data/allowed_students.txt",
+        fsync_interval: float = 1.0,
+        compact_threshold: int = 1000,
+    ):
         self.data_file = data_file
+        self.journal_file = f"{data_file}.journal"
+        self.scheme_file = f"{data_file}.scheme"
         self.data_dir = "data"
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
         self._ensure_data_directory()
+        self._students: Dict[str, str] = {}
+        self._free_count = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_entries = 0
+        self._journal_dirty = False
+        self._worker = None
+        self._stop_event = threading.Event()
     
     def _ensure_data_directory(self):
         """Создает папку data если ее нет"""
@@ -19,67 +78,281 @@ class StudentDatabase:
     
     def _hash_student_id(self, student_id: str) -> str:
         """Хеширует номер студбилета для безопасности"""
-        return hashlib.sha256(student_id.strip().encode()).hexdigest()
+        return hash_student_id(student_id)
+    
+    def _load_index(self):
+        """Один раз загружает снимок и проигрывает поверх него журнал"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.data_file):
+                with open(self.data_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line or line.startswith(SCHEME_HEADER):
+                            continue
+                        stored_hash, status = line.split(":", 1)
+                        self._set_status(stored_hash, status)
+            # .old остается, если процесс упал во время сжатия журнала
+            for journal_file in (f"{self.journal_file}.old", self.journal_file):
+                self._replay_journal(journal_file)
+            if not self._students and not os.path.exists(self.scheme_file):
+                # Пустая база сразу заводится в текущей схеме
+                self._write_scheme(HASH_SCHEME)
+            self._loaded = True
+        self._check_scheme()
+    
+    def stored_scheme(self) -> str:
+        """Схема, которой захешированы номера в хранилище: заголовок снимка, затем .scheme"""
+        if os.path.exists(self.data_file):
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                first_line = f.readline().strip()
+            if first_line.startswith(SCHEME_HEADER):
+                return first_line[len(SCHEME_HEADER):] or LEGACY_SCHEME
+        if not os.path.exists(self.scheme_file):
+            return LEGACY_SCHEME
+        with open(self.scheme_file, "r", encoding="utf-8") as f:
+            return f.read().strip() or LEGACY_SCHEME
+    
+    def _write_scheme(self, scheme: str):
+        with open(self.scheme_file, "w", encoding="utf-8") as f:
+            f.write(f"{scheme}\n")
+    
+    def _check_scheme(self):
+        stored = self.stored_scheme()
+        if stored != HASH_SCHEME:
+            logger.warning(
+                "База студбилетов захеширована схемой %s, а бот использует %s. "
+                "Выполни: python roster.py rehash",
+                stored, HASH_SCHEME,
+            )
+    
+    def require_current_scheme(self):
+        """ValueError, если хранилище в другой схеме: новые хеши смешались бы со старыми,
+        а rehash захешировал бы их повторно"""
+        stored = self.stored_scheme()
+        if stored != HASH_SCHEME:
+            raise ValueError(
+                f"База студбилетов захеширована схемой {stored}, а бот использует {HASH_SCHEME}. "
+                "Выполни: python roster.py rehash"
+            )
+    
+    def rehash(self) -> int:
+        """Потоково переводит хеши снимка в HMAC-схему, возвращает число записей"""
+        if self.stored_scheme() == HASH_SCHEME:
+            return 0
+        if HASH_SCHEME == LEGACY_SCHEME:
+            raise ValueError("Для перехода на HMAC укажи STUDENT_HASH_KEY в .env")
+        self.compact()
+        tmp_file = f"{self.data_file}.tmp"
+        count = 0
+        with self._lock:
+            with open(self.data_file, "r", encoding="utf-8") as src, \
+                    open(tmp_file, "w", encoding="utf-8") as dst:
+                # Новая схема записывается в тот же файл, что и новые хеши: после падения
+                # снимок либо целиком старый, либо целиком новый, и повторный rehash безопасен
+                dst.write(f"{SCHEME_HEADER}{HASH_SCHEME}\n")
+                for line in src:
+                    line = line.strip()
+                    if not line or line.startswith(SCHEME_HEADER):
+                        continue
+                    stored_hash, status = line.split(":", 1)
+                    dst.write(f"{upgrade_hash(stored_hash)}:{status}\n")
+                    count += 1
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_file, self.data_file)
+            self._write_scheme(HASH_SCHEME)
+            self._students = {}
+            self._free_count = 0
+            self._journal_entries = 0
+            self._loaded = False
+        return count
+    
+    def _replay_journal(self, journal_file: str):
+        """Применяет события журнала к индексу"""
+        if not os.path.exists(journal_file):
+            return
+        with open(journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Недописанная запись при падении процесса
+                    break
+                event, _, payload = line.rstrip("\n").partition(":")
+                if event == "add":
+                    if payload not in self._students:
+                        self._set_status(payload, FREE_STATUS)
+                elif event == "claim":
+                    student_hash, _, username = payload.partition(":")
+                    self._set_status(student_hash, f"{OCCUPIED_PREFIX}{username}")
+                elif event == "release":
+                    self._set_status(payload, FREE_STATUS)
+                self._journal_entries += 1
+    
+    def _set_status(self, student_hash: str, status: str):
+        """Обновляет запись в индексе и счетчик свободных номеров"""
+        previous = self._students.get(student_hash)
+        if previous == FREE_STATUS:
+            self._free_count -= 1
+        if status == FREE_STATUS:
+            self._free_count += 1
+        self._students[student_hash] = status
+    
+    def _append_event(self, event: str):
+        """Дописывает событие в журнал; fsync выполняется фоновым потоком пачками"""
+        if self._journal is None:
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            self._start_worker()
+        self._journal.write(f"{event}\n")
+        self._journal.flush()
+        metrics.file_writes.inc("student_journal")
+        self._journal_dirty = True
+        self._journal_entries += 1
+    
+    def _start_worker(self):
+        """Запускает фоновый поток fsync и сжатия журнала"""
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(
+            target=self._journal_loop, name="student-journal", daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.close)
+    
+    def _journal_loop(self):
+        while not self._stop_event.wait(self.fsync_interval):
+            self._sync_journal()
+            if self._journal_entries >= self.compact_threshold:
+                self.compact()
+    
+    def _sync_journal(self):
+        with self._lock:
+            if self._journal is not None and self._journal_dirty:
+                os.fsync(self._journal.fileno())
+                self._journal_dirty = False
+    
+    def compact(self):
+        """Сворачивает журнал в новый снимок через атомарное переименование"""
+        old_journal = f"{self.journal_file}.old"
+        with self._lock:
+            self._load_index()
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+                self._journal_dirty = False
+            if os.path.exists(self.journal_file):
+                os.replace(self.journal_file, old_journal)
+            snapshot = list(self._students.items())
+            self._journal_entries = 0
+            scheme = self.stored_scheme()
+        
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(f"{SCHEME_HEADER}{scheme}\n")
+            f.writelines(f"{student_hash}:{status}\n" for student_hash, status in snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        metrics.file_writes.inc("student_snapshot")
+        if os.path.exists(old_journal):
+            os.remove(old_journal)
+    
+    def close(self):
+        """Сбрасывает журнал на диск и останавливает фоновый поток"""
+        self._stop_event.set()
+        self._sync_journal()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
     
     def add_student(self, student_id: str) -> bool:
         """Добавляет номер студбилета в базу (еще не занят)"""
+        metrics.db_lookups.inc("add")
+        self.require_current_scheme()
         student_hash = self._hash_student_id(student_id)
+        self._load_index()
         
-        if self.is_student_exists(student_id):
-            return False
-        
-        with open(self.data_file, "a", encoding="utf-8") as f:
-            f.write(f"{student_hash}:свободен\n")
+        with self._lock:
+            if student_hash in self._students:
+                return False
+            
+            self._append_event(f"add:{student_hash}")
+            self._set_status(student_hash, FREE_STATUS)
         
         return True
     
     def is_student_exists(self, student_id: str) -> bool:
         """Проверяет существует ли номер студбилета в базе"""
-        student_hash = self._hash_student_id(student_id)
-        
-        if not os.path.exists(self.data_file):
-            return False
-        
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            for line in f:
-                stored_hash, status = line.strip().split(":")
-                if stored_hash == student_hash:
-                    return True
-        return False
+        metrics.db_lookups.inc("exists")
+        self._load_index()
+        return self._hash_student_id(student_id) in self._students
     
     def authenticate_student(self, student_id: str, user: User = None) -> Tuple[bool, str]:
         """Аутентифицирует студента и помечает номер как занятый с username"""
+        metrics.db_lookups.inc("authenticate")
         student_hash = self._hash_student_id(student_id)
+        self._load_index()
         
-        if not os.path.exists(self.data_file):
+        if not self._students and not os.path.exists(self.data_file):
             return False, "База данных не найдена"
         
-        lines = []
-        found = False
-        result_message = ""
-        
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            for line in f:
-                stored_hash, status = line.strip().split(":")
-                if stored_hash == student_hash:
-                    found = True
-                    if status == "свободен":
-                        username = self._format_username(user)
-                        lines.append(f"{stored_hash}:занят@{username}\n")
-                        result_message = "Успешная аутентификация!"
-                    else:
-                        occupied_by = status.split("@")[1] if "@" in status else "неизвестный пользователь"
-                        result_message = f"Этот номер уже используется пользователем: {occupied_by}"
-                        lines.append(line)
-                else:
-                    lines.append(line)
+        with self._lock:
+            status = self._students.get(student_hash)
+            if status is None:
+                return False, "Номер студбилета не найден"
+            
+            if user is not None and occupant_id(status) == user.id:
+                # Повторный ввод своего же номера (например, после перезапуска бота)
+                return True, "Успешная аутентификация!"
+            
+            if status != FREE_STATUS:
+                return False, f"Этот номер уже используется пользователем: {occupied_by(status)}"
+            
+            claim_status = self._claim_status(user)
+            self._append_event(f"claim:{student_hash}:{claim_status[len(OCCUPIED_PREFIX):]}")
+            self._set_status(student_hash, claim_status)
+        return True, "Успешная аутентификация!"
+    
+    def bulk_add(self, student_hashes: Iterable[str]) -> int:
+        """Добавляет готовые хеши одной атомарной записью нового снимка"""
+        self.require_current_scheme()
+        with self._lock:
+            self._load_index()
+            added = 0
+            for student_hash in student_hashes:
+                if student_hash not in self._students:
+                    self._set_status(student_hash, FREE_STATUS)
+                    added += 1
+            if added:
+                self.compact()
+        return added
+    
+    def iter_records(self) -> Iterator[Tuple[str, str]]:
+        """Перебирает пары (хеш, статус) из снимка индекса"""
+        self._load_index()
+        with self._lock:
+            records = list(self._students.items())
+        return iter(records)
+    
+    def release_student(self, student_id: str) -> bool:
+        """Освобождает занятый номер студбилета"""
+        metrics.db_lookups.inc("release")
+        student_hash = self._hash_student_id(student_id)
+        self._load_index()
         
-        if found:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                f.writelines(lines)
-            return (result_message == "Успешная аутентификация!"), result_message
-        else:
-            return False, "Номер студбилета не найден"
+        with self._lock:
+            status = self._students.get(student_hash)
+            if status is None or status == FREE_STATUS:
+                return False
+            
+            self._append_event(f"release:{student_hash}")
+            self._set_status(student_hash, FREE_STATUS)
+        return True
     
     def _format_username(self, user: User) -> str:
         """Форматирует username пользователя"""
@@ -94,22 +367,274 @@ class StudentDatabase:
         else:
             return f"user_{user.id}"
     
+    def _claim_status(self, user: User) -> str:
+        """Статус занятого номера: имя для показа и id, по которому узнается владелец"""
+        username = self._format_username(user)
+        if not user:
+            return f"{OCCUPIED_PREFIX}{username}"
+        return f"{OCCUPIED_PREFIX}{username}{OWNER_ID_SEPARATOR}{user.id}"
+    
     def get_student_count(self) -> Tuple[int, int]:
         """Возвращает общее количество номеров и количество свободных"""
-        if not os.path.exists(self.data_file):
-            return 0, 0
-        
-        total = 0
-        free = 0
-        
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            for line in f:
-                total += 1
-                status = line.strip().split(":")[1]
-                if status == "свободен":
-                    free += 1
-        
+        self._load_index()
+        return len(self._students), self._free_count
+
+
+class SQLiteConnectionPool:
+    """Небольшой пул соединений SQLite для работы из потоков исполнителя"""
+
+    def __init__(self, db_file: str, size: int = 4):
+        self.db_file = db_file
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, size)):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_file, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class SQLiteStudentDatabase(StudentDatabase):
+    """Хранилище студбилетов в SQLite (WAL) с тем же API, что и StudentDatabase"""
+
+    def __init__(
+        self,
+        db_file: str = "data/students.sqlite3",
+        text_file: str = "data/allowed_students.txt",
+        pool_size: int = 4,
+    ):
+        super().__init__(text_file)
+        self.db_file = db_file
+        self.scheme_file = f"{db_file}.scheme"
+        self._pool = SQLiteConnectionPool(db_file, pool_size)
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """Создает таблицу и однократно импортирует текстовый реестр"""
+        with self._pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS students ("
+                "hash TEXT PRIMARY KEY, status TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_students_status ON students(status)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            is_empty = conn.execute("SELECT 1 FROM students LIMIT 1").fetchone() is None
+        if is_empty and (os.path.exists(self.data_file) or os.path.exists(self.journal_file)):
+            self.import_from_text(self.data_file)
+        elif is_empty and self._meta_scheme() is None and not os.path.exists(self.scheme_file):
+            self._write_scheme(HASH_SCHEME)
+        self._check_scheme()
+
+    def _meta_scheme(self):
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'scheme'").fetchone()
+        return row[0] if row else None
+
+    def stored_scheme(self) -> str:
+        """Схема хранится в таблице meta и меняется в одной транзакции с хешами"""
+        scheme = self._meta_scheme()
+        if scheme is not None:
+            return scheme
+        if not os.path.exists(self.scheme_file):
+            return LEGACY_SCHEME
+        with open(self.scheme_file, "r", encoding="utf-8") as f:
+            return f.read().strip() or LEGACY_SCHEME
+
+    def _write_scheme(self, scheme: str):
+        with self._pool.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('scheme', ?)", (scheme,))
+
+    def import_from_text(self, text_file: str) -> int:
+        """Импортирует реестр из текстового снимка и журнала, возвращает число новых номеров"""
+        source = StudentDatabase(text_file)
+        source._load_index()
+        self._write_scheme(source.stored_scheme())
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO students (hash, status) VALUES (?, ?)",
+                    source._students.items(),
+                )
+                imported = conn.total_changes - before
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def bulk_add(self, student_hashes: Iterable[str]) -> int:
+        """Добавляет готовые хеши в одной транзакции"""
+        self.require_current_scheme()
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO students (hash, status) VALUES (?, ?)",
+                    ((student_hash, FREE_STATUS) for student_hash in student_hashes),
+                )
+                added = conn.total_changes - before
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        metrics.file_writes.inc("student_sqlite")
+        return added
+
+    def rehash(self) -> int:
+        """Переводит хеши в HMAC-схему одной транзакцией, возвращает число записей"""
+        if self.stored_scheme() == HASH_SCHEME:
+            return 0
+        if HASH_SCHEME == LEGACY_SCHEME:
+            raise ValueError("Для перехода на HMAC укажи STUDENT_HASH_KEY в .env")
+        with self._pool.connection() as conn:
+            conn.create_function("upgrade_hash", 1, upgrade_hash, deterministic=True)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = conn.execute("UPDATE students SET hash = upgrade_hash(hash)").rowcount
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('scheme', ?)", (HASH_SCHEME,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def iter_records(self) -> Iterator[Tuple[str, str]]:
+        """Потоково перебирает пары (хеш, статус)"""
+        with self._pool.connection() as conn:
+            yield from conn.execute("SELECT hash, status FROM students ORDER BY hash")
+
+    def add_student(self, student_id: str) -> bool:
+        """Добавляет номер студбилета в базу (еще не занят)"""
+        metrics.db_lookups.inc("add")
+        self.require_current_scheme()
+        student_hash = self._hash_student_id(student_id)
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO students (hash, status) VALUES (?, ?)",
+                (student_hash, FREE_STATUS),
+            )
+        if cursor.rowcount == 1:
+            metrics.file_writes.inc("student_sqlite")
+            return True
+        return False
+
+    def is_student_exists(self, student_id: str) -> bool:
+        """Проверяет существует ли номер студбилета в базе"""
+        metrics.db_lookups.inc("exists")
+        student_hash = self._hash_student_id(student_id)
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT 1 FROM students WHERE hash = ?", (student_hash,)).fetchone()
+        return row is not None
+
+    def authenticate_student(self, student_id: str, user: User = None) -> Tuple[bool, str]:
+        """Аутентифицирует студента одним условным UPDATE, безопасным при конкуренции"""
+        metrics.db_lookups.inc("authenticate")
+        student_hash = self._hash_student_id(student_id)
+        new_status = self._claim_status(user)
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE students SET status = ? WHERE hash = ? AND status = ?",
+                (new_status, student_hash, FREE_STATUS),
+            )
+            if cursor.rowcount == 1:
+                metrics.file_writes.inc("student_sqlite")
+                return True, "Успешная аутентификация!"
+            row = conn.execute(
+                "SELECT status FROM students WHERE hash = ?", (student_hash,)
+            ).fetchone()
+        if row is None:
+            return False, "Номер студбилета не найден"
+        status = row[0]
+        if user is not None and occupant_id(status) == user.id:
+            return True, "Успешная аутентификация!"
+        return False, f"Этот номер уже используется пользователем: {occupied_by(status)}"
+
+    def release_student(self, student_id: str) -> bool:
+        """Освобождает занятый номер студбилета"""
+        metrics.db_lookups.inc("release")
+        student_hash = self._hash_student_id(student_id)
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE students SET status = ? WHERE hash = ? AND status != ?",
+                (FREE_STATUS, student_hash, FREE_STATUS),
+            )
+        if cursor.rowcount == 1:
+            metrics.file_writes.inc("student_sqlite")
+            return True
+        return False
+
+    def get_student_count(self) -> Tuple[int, int]:
+        """Возвращает общее количество номеров и количество свободных"""
+        with self._pool.connection() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+            free = conn.execute(
+                "SELECT COUNT(*) FROM students WHERE status = ?", (FREE_STATUS,)
+            ).fetchone()[0]
         return total, free
 
+    def compact(self):
+        """WAL сворачивается самим SQLite; принудительно делаем checkpoint"""
+        with self._pool.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self._pool.close()
+
+
+_storage_lock = None
+
+
+def storage_lock_file() -> str:
+    data_file = DB_SQLITE_FILE if DB_BACKEND == "sqlite" else "data/allowed_students.txt"
+    return f"{data_file}.lock"
+
+
+def lock_storage() -> bool:
+    """Эксклюзивная блокировка хранилища до конца процесса; False, если его держит другой процесс.
+
+    Ее берут процесс, который пишет в базу (бот или фронт рабочих), и roster.py
+    import/rehash: иначе сжатие снимка одним процессом теряет записи другого.
+    """
+    global _storage_lock
+    if _storage_lock is not None or fcntl is None:
+        return True
+    path = storage_lock_file()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _storage_lock = handle
+    return True
+
+
+def create_database() -> StudentDatabase:
+    """Создает хранилище студбилетов согласно DB_BACKEND"""
+    if DB_BACKEND == "sqlite":
+        return SQLiteStudentDatabase(DB_SQLITE_FILE, pool_size=DB_POOL_SIZE)
+    return StudentDatabase()
+
 
-db = StudentDatabase()
+# Индекс базы грузится при старте бота (bot.main) или при первом обращении
+db = LazyService("db", create_database, warm=lambda database: database.get_student_count())
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # handlers/auth.py
 
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 from database import db
 from utils.logger import logger
+from utils.metrics import instrument_handler
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -24,6 +26,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(welcome_text, parse_mode='Markdown')
 
 
+@instrument_handler
 async def handle_student_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ввода номера студбилета"""
     user = update.effective_user
@@ -31,7 +34,11 @@ async def handle_student_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     logger.log_text_message(user, f"Введен студбилет: {student_id}")
     
-    success, message = db.authenticate_student(student_id, user)
+    # Запись в хранилище блокирующая — выполняем вне цикла событий
+    loop = asyncio.get_running_loop()
+    success, message = await loop.run_in_executor(
+        None, db.authenticate_student, student_id, user
+    )
     
     logger.log_authentication(user, student_id, success, message)
     
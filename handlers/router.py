@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# handlers/router.py
+
+import re
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Pattern, Tuple, Union
+
+RELATIVE_DAYS = {"вчера": -1, "сегодня": 0, "завтра": 1, "послезавтра": 2}
+WEEKDAY_NAMES = {
+    "понедельник": 0, "пн": 0,
+    "вторник": 1, "вт": 1,
+    "среда": 2, "среду": 2, "ср": 2,
+    "четверг": 3, "чт": 3,
+    "пятница": 4, "пятницу": 4, "пт": 4,
+    "суббота": 5, "субботу": 5, "сб": 5,
+    "воскресенье": 6, "вс": 6,
+}
+# Какая неделя: сдвиг от текущей или четность ближайшей подходящей недели
+WEEK_SHIFTS = {"эта": 0, "текущая": 0, "следующая": 1, "след": 1}
+WEEK_PARITIES = {"нечётная": "odd", "нечетная": "odd", "чётная": "even", "четная": "even"}
+DATE_RE = re.compile(r"^(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?$")
+
+
+class Intent(NamedTuple):
+    name: str
+    argument: Optional[str]
+
+
+class TextRouter:
+    """Таблица намерений, собранная в одно регулярное выражение.
+
+    Каждое намерение — шаблон с необязательной группой аргумента. Все шаблоны
+    объединяются в одну альтернативу, поэтому сообщение разбирается за один
+    проход, а нерелевантный текст отбрасывается уже на первых символах.
+    """
+
+    def __init__(self):
+        self._routes: List[Tuple[str, str]] = []
+        self.pattern: Optional[Pattern] = None
+
+    def add(self, name: str, pattern: str) -> "TextRouter":
+        """Добавляет намерение; аргумент в шаблоне обозначается группой (?P<arg>...)"""
+        self._routes.append((name, pattern.replace("(?P<arg>", f"(?P<{name}_arg>")))
+        self.pattern = None
+        return self
+
+    def compile(self) -> Pattern:
+        alternatives = "|".join(f"(?P<{name}>{pattern})" for name, pattern in self._routes)
+        self.pattern = re.compile(rf"^\s*(?:{alternatives})\s*$", re.IGNORECASE)
+        return self.pattern
+
+    def intent_from_match(self, match) -> Intent:
+        # Внешняя группа намерения закрывается последней
+        name = match.lastgroup
+        argument = match.groupdict().get(f"{name}_arg")
+        return Intent(name, argument.strip() if argument else None)
+
+    def match(self, text: str) -> Optional[Intent]:
+        pattern = self.pattern or self.compile()
+        found = pattern.match(text)
+        return self.intent_from_match(found) if found else None
+
+
+def parse_date_argument(argument: Optional[str], today: date) -> Optional[date]:
+    """Понимает: сегодня, завтра, дни недели (ближайший), dd.mm и dd.mm.yyyy"""
+    if not argument:
+        return today
+    argument = argument.strip().lower()
+    if argument.startswith("на "):
+        argument = argument[3:].strip()
+    if argument in RELATIVE_DAYS:
+        return today + timedelta(days=RELATIVE_DAYS[argument])
+    if argument in WEEKDAY_NAMES:
+        return today + timedelta(days=(WEEKDAY_NAMES[argument] - today.weekday()) % 7)
+    found = DATE_RE.match(argument)
+    if not found:
+        return None
+    day, month, year = found.groups()
+    try:
+        return date(int(year) if year else today.year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_week_argument(argument: Optional[str]) -> Optional[Union[int, str]]:
+    """Возвращает сдвиг в неделях или четность ("odd"/"even"); None — не распознано"""
+    if not argument:
+        return 0
+    argument = argument.strip().lower()
+    if argument in WEEK_SHIFTS:
+        return WEEK_SHIFTS[argument]
+    return WEEK_PARITIES.get(argument)
+
+
+router = (
+    TextRouter()
+    # Неделя и дни раньше общего шаблона расписания: "пары на неделю" должно уйти сюда
+    .add("week", r"(?:(?P<arg>\w{3,10})\s+)?неделя|(?:расписание|пары)\s+на\s+неделю")
+    .add("next", r"(?:следующая|ближайшая)\s+пара|что\s+дальше|какая\s+(?:сейчас\s+)?пара")
+    .add("days", r"(?:расписание|пары)\s+на\s+(?P<arg>\d{1,2})\s+(?:день|дня|дней)")
+    .add("schedule", r"(?:расписание|пары)(?:\s+(?P<arg>[\w.\s]{1,20}))?")
+    .add("student_id", r"(?P<arg>\d{4,12})")
+)
+router.compile()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Массовый импорт, экспорт и отчет по базе студбилетов.
+
+    python roster.py import students.csv --column 0 --skip-header
+    python roster.py export roster.csv --status free
+    python roster.py report
+    python roster.py rehash
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List
+
+from utils.handoff import STATE_FILE, pid_alive, read_state
+from utils.hashing import hash_many
+
+CHUNK_SIZE = 10_000
+# Сколько пачек на процесс пула может ждать хеширования одновременно
+CHUNKS_IN_FLIGHT = 2
+
+
+def read_student_ids(path: str, column: int, skip_header: bool) -> Iterator[str]:
+    """Потоково читает номера из CSV или простого списка (по одному в строке)"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        rows = csv.reader(f)
+        if skip_header:
+            next(rows, None)
+        for row in rows:
+            if len(row) > column:
+                student_id = row[column].strip()
+                if student_id:
+                    yield student_id
+
+
+def chunked(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def hash_in_parallel(student_ids: Iterator[str], workers: int) -> Iterator[str]:
+    """Хеширует номера пачками в пуле процессов, сохраняя порядок.
+
+    В работе не больше workers * CHUNKS_IN_FLIGHT пачек: файл читается по мере
+    хеширования, а не целиком (executor.map забрал бы весь генератор сразу).
+    """
+    if workers <= 1:
+        for chunk in chunked(student_ids, CHUNK_SIZE):
+            yield from hash_many(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunked(student_ids, CHUNK_SIZE):
+            pending.append(executor.submit(hash_many, chunk))
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def ensure_bot_stopped() -> bool:
+    """Импорт и перехеширование переписывают снимок базы: бот должен быть остановлен"""
+    from database import lock_storage
+
+    state = read_state(STATE_FILE) or {}
+    pid = state.get("pid")
+    if pid and pid != os.getpid() and pid_alive(pid):
+        print(f"[!] Бот работает (pid {pid}) — останови его перед изменением базы")
+        return False
+    if not lock_storage():
+        print("[!] База занята другим процессом (бот или еще один roster.py) — бот должен быть остановлен")
+        return False
+    return True
+
+
+def import_command(args) -> int:
+    from database import db
+
+    if not os.path.exists(args.file):
+        print(f"[!] Файл {args.file} не найден")
+        return 1
+    if not ensure_bot_stopped():
+        return 1
+    try:
+        db.require_current_scheme()
+    except ValueError as e:
+        print(f"[!] {e}")
+        return 1
+    started = time.perf_counter()
+    seen = set()
+    duplicates = 0
+    for student_hash in hash_in_parallel(
+        read_student_ids(args.file, args.column, args.skip_header), args.workers
+    ):
+        if student_hash in seen:
+            duplicates += 1
+        else:
+            seen.add(student_hash)
+    added = db.bulk_add(seen)
+    db.close()
+    elapsed = time.perf_counter() - started
+    print(f"[+] Прочитано уникальных номеров: {len(seen)} (повторов в файле: {duplicates})")
+    print(f"[+] Добавлено новых: {added}, уже были в базе: {len(seen) - added}")
+    print(f"[=] Время: {elapsed:.2f} с")
+    return 0
+
+
+def export_command(args) -> int:
+    from database import FREE_STATUS, db, occupant_id, occupied_by
+
+    exported = 0
+    with open(args.file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["hash", "status", "occupied_by", "user_id"])
+        for student_hash, status in db.iter_records():
+            is_free = status == FREE_STATUS
+            if (args.status == "free" and not is_free) or (args.status == "occupied" and is_free):
+                continue
+            if is_free:
+                writer.writerow([student_hash, "free", "", ""])
+            else:
+                owner_id = occupant_id(status)
+                writer.writerow([student_hash, "occupied", occupied_by(status), "" if owner_id is None else owner_id])
+            exported += 1
+    print(f"[+] Выгружено записей: {exported} -> {args.file}")
+    return 0
+
+
+def report_command(args) -> int:
+    from database import db
+
+    total, free = db.get_student_count()
+    print(f"Всего номеров: {total}")
+    print(f"Свободно: {free}")
+    print(f"Занято: {total - free}")
+    return 0
+
+
+def rehash_command(args) -> int:
+    from database import db
+
+    if not ensure_bot_stopped():
+        return 1
+    started = time.perf_counter()
+    try:
+        count = db.rehash()
+    except ValueError as e:
+        print(f"[!] {e}")
+        return 1
+    db.close()
+    if count:
+        print(f"[+] Перехешировано записей: {count} за {time.perf_counter() - started:.2f} с")
+    else:
+        print("[=] База уже использует текущую схему хеширования")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Управление базой студбилетов WISEACRE")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="массово добавить номера из CSV/списка (бот должен быть остановлен)")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--column", type=int, default=0, help="номер колонки CSV с номером")
+    import_parser.add_argument("--skip-header", action="store_true")
+    import_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    import_parser.set_defaults(handler=import_command)
+
+    export_parser = commands.add_parser("export", help="выгрузить базу в CSV")
+    export_parser.add_argument("file")
+    export_parser.add_argument("--status", choices=["all", "free", "occupied"], default="all")
+    export_parser.set_defaults(handler=export_command)
+
+    report_parser = commands.add_parser("report", help="показать количество номеров")
+    report_parser.set_defaults(handler=report_command)
+
+    rehash_parser = commands.add_parser(
+        "rehash", help="перевести хеши на HMAC с ключом STUDENT_HASH_KEY (бот должен быть остановлен)"
+    )
+    rehash_parser.set_defaults(handler=rehash_command)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
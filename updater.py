@@ -1,9 +1,28 @@
 #!/usr/bin/env python3
 
+import argparse
+import hashlib
 import os
+import re
+import signal
 import subprocess
 import sys
-import pkg_resources
+import time
+from importlib import metadata
+from utils.handoff import READY_ENV, REPLACES_ENV, STATE_FILE, pid_alive, read_state
+
+CACHE_DIR = ".installer_cache"
+DEPLOY_DIR = ".deploy"
+# Состояния нового процесса по порядку: ожидание "warm" выполнено и при "serving"
+HANDOFF_STATES = ("warm", "serving")
+REQUIREMENTS_FILE = "requirements.txt"
+REQUIREMENT_RE = re.compile(
+    r"^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[(?P<extras>[^\]]*)\])?\s*\(?(?P<specs>[^;)]*)\)?\s*(?:;(?P<marker>.*))?$"
+)
+SPECIFIER_RE = re.compile(r"^\s*(===|==|!=|~=|>=|<=|>|<)\s*([^\s]+)\s*$")
+# Комментарий, как у pip: # в начале строки или после пробела (URL#egg=... — не комментарий)
+COMMENT_RE = re.compile(r"(?:^|\s+)#.*$")
+EXTRA_MARKER_RE = re.compile(r"""^\s*extra\s*==\s*["']([^"']+)["']\s*$""")
 
 GITIGNORE_TEMPLATE = """# === Python ===
 __pycache__/
@@ -54,6 +73,7 @@ __dist__/
 *.egg-info/
 *.spec
 .installer_cache/
+.deploy/
 
 # === Compiled files ===
 *.cpython-*
@@ -65,9 +85,63 @@ __dist__/
 """
 
 
+def parse_version(version):
+    """Числовая часть версии: 20.7 -> (20, 7); суффиксы вроде rc1/.post1 не учитываются"""
+    match = re.match(r"\d+(?:\.\d+)*", version.strip())
+    return tuple(int(part) for part in match.group(0).split(".")) if match else ()
+
+
+def _padded(a, b):
+    size = max(len(a), len(b))
+    return a + (0,) * (size - len(a)), b + (0,) * (size - len(b))
+
+
+def version_matches(version, operator, target):
+    if operator == "===":
+        return version == target
+    if target.endswith(".*"):
+        prefix = parse_version(target[:-2])
+        matched = parse_version(version)[:len(prefix)] == prefix
+        return matched if operator == "==" else not matched
+    current, wanted = _padded(parse_version(version), parse_version(target))
+    if operator == "~=":
+        prefix = parse_version(target)[:-1]
+        return current >= wanted and parse_version(version)[:len(prefix)] == prefix
+    return {
+        "==": current == wanted,
+        "!=": current != wanted,
+        ">=": current >= wanted,
+        "<=": current <= wanted,
+        ">": current > wanted,
+        "<": current < wanted,
+    }[operator]
+
+
+def parse_requirement(line):
+    """Разбирает строку requirements: (имя, extras, [(оператор, версия)], маркер) или None"""
+    line = COMMENT_RE.sub("", line).strip()
+    if not line or line.startswith("-"):
+        return None
+    match = REQUIREMENT_RE.match(line)
+    if not match:
+        return None
+    extras = [extra.strip() for extra in (match.group("extras") or "").split(",") if extra.strip()]
+    specs = []
+    for spec in filter(None, (part.strip() for part in match.group("specs").split(","))):
+        spec_match = SPECIFIER_RE.match(spec)
+        if not spec_match:
+            return None
+        specs.append(spec_match.groups())
+    return match.group("name"), extras, specs, (match.group("marker") or "").strip()
+
+
+def satisfies(version, specs):
+    return all(version_matches(version, operator, target) for operator, target in specs)
+
+
 class WiseacreUpdater:
-    def __init__(self):
-        self.repo_path = os.getcwd()
+    def __init__(self, repo_path=None):
+        self.repo_path = repo_path or os.getcwd()
         self.required_python = (3, 8)
         self.required_packages = {
             "python-telegram-bot": "20.7",
@@ -132,44 +206,121 @@ class WiseacreUpdater:
         self.run_command("git stash pop", "Restoring local changes")
         return success
 
-    def check_and_update_packages(self):
-        print("Checking packages...")
+    def load_requirements(self):
+        """Требования из requirements.txt плюс минимальные версии из required_packages"""
+        requirements = []
+        requirements_file = os.path.join(self.repo_path, REQUIREMENTS_FILE)
+        if os.path.exists(requirements_file):
+            with open(requirements_file, "r", encoding="utf-8") as f:
+                requirements = [req for req in map(parse_requirement, f) if req is not None]
+        listed = {name.lower() for name, _, _, _ in requirements}
         for package, required_ver in self.required_packages.items():
+            if package.lower() not in listed:
+                requirements.append((package, [], [(">=", required_ver)], ""))
+        return requirements
+
+    def unchecked_requirements(self):
+        """Строки requirements.txt, которые updater не проверяет сам: маркеры окружения,
+        URL/VCS, name @ url, -r/-e и прочие опции pip"""
+        lines = []
+        requirements_file = os.path.join(self.repo_path, REQUIREMENTS_FILE)
+        if os.path.exists(requirements_file):
+            with open(requirements_file, "r", encoding="utf-8") as f:
+                for raw_line in f:
+                    line = COMMENT_RE.sub("", raw_line).strip()
+                    if not line:
+                        continue
+                    parsed = parse_requirement(line)
+                    if parsed is None or parsed[3]:
+                        lines.append(line)
+        return lines
+
+    def _unsatisfied(self, name, extras, specs):
+        """Причины, по которым требование не выполнено; пустой список — все в порядке"""
+        try:
+            installed_ver = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return [f"{name} is not installed"]
+        problems = []
+        if not satisfies(installed_ver, specs):
+            problems.append(f"{name} {installed_ver} does not match {','.join(op + ver for op, ver in specs)}")
+        # Зависимости extras (например, job-queue -> APScheduler) проверяются по метаданным пакета
+        for dependency in metadata.requires(name) or []:
+            parsed = parse_requirement(dependency)
+            if parsed is None:
+                continue
+            dep_name, _, dep_specs, marker = parsed
+            extra = EXTRA_MARKER_RE.match(marker) if marker else None
+            if extra is None or extra.group(1) not in extras:
+                continue
             try:
-                installed_ver = pkg_resources.get_distribution(package).version
-                if self.compare_versions(installed_ver, required_ver) < 0:
-                    print(f"Updating {package} {installed_ver} -> {required_ver}")
-                    subprocess.run(
-                        [sys.executable, "-m", "pip", "install", f"{package}>={required_ver}"],
-                        check=True
-                    )
-                else:
-                    print(f"Package {package} {installed_ver} (up to date)")
-            except pkg_resources.DistributionNotFound:
-                print(f"Installing {package} {required_ver}")
-                subprocess.run(
-                    [sys.executable, "-m", "pip", "install", f"{package}>={required_ver}"],
-                    check=True
-                )
-            except Exception as e:
-                print(f"Error with {package}: {e}")
-
-    def compare_versions(self, ver1, ver2):
-        v1_parts = list(map(int, ver1.split(".")))
-        v2_parts = list(map(int, ver2.split(".")))
-        for i in range(max(len(v1_parts), len(v2_parts))):
-            v1_part = v1_parts[i] if i < len(v1_parts) else 0
-            v2_part = v2_parts[i] if i < len(v2_parts) else 0
-            if v1_part < v2_part:
-                return -1
-            elif v1_part > v2_part:
-                return 1
-        return 0
+                dep_ver = metadata.version(dep_name)
+            except metadata.PackageNotFoundError:
+                problems.append(f"{dep_name} (extra {extra.group(1)} of {name}) is not installed")
+                continue
+            if not satisfies(dep_ver, dep_specs):
+                problems.append(f"{dep_name} {dep_ver} (extra {extra.group(1)} of {name}) is outdated")
+        return problems
+
+    def check_and_update_packages(self):
+        """Возвращает список требований, которые нужно установить или обновить"""
+        print("Checking packages...")
+        outdated = []
+        for name, extras, specs, marker in self.load_requirements():
+            if marker:
+                # Маркеры окружения не вычисляем: такие строки ставит pip через -r (unchecked_requirements)
+                continue
+            problems = self._unsatisfied(name, extras, specs)
+            requirement = name + (f"[{','.join(extras)}]" if extras else "") + ",".join(op + ver for op, ver in specs)
+            if problems:
+                for problem in problems:
+                    print(f"Outdated: {problem}")
+                outdated.append(requirement)
+            else:
+                print(f"Package {requirement} (up to date)")
+        return outdated
+
+    def requirements_hash(self):
+        """Хеш requirements.txt и интерпретатора: новое окружение дает новый хеш"""
+        digest = hashlib.sha256(f"{sys.executable}\n{sys.version}\n".encode("utf-8"))
+        requirements_file = os.path.join(self.repo_path, REQUIREMENTS_FILE)
+        if os.path.exists(requirements_file):
+            with open(requirements_file, "rb") as f:
+                digest.update(f.read())
+        for package, required_ver in sorted(self.required_packages.items()):
+            digest.update(f"{package}>={required_ver}\n".encode("utf-8"))
+        return digest.hexdigest()
 
     def install_requirements(self):
-        if os.path.exists("requirements.txt"):
-            print("Installing dependencies from requirements.txt...")
-            self.run_command("pip install -r requirements.txt", "Installing dependencies")
+        """Ставит недостающие пакеты одним вызовом pip; неизмененное окружение пропускается"""
+        cache_dir = os.path.join(self.repo_path, CACHE_DIR)
+        cache_file = os.path.join(cache_dir, "requirements.sha256")
+        current_hash = self.requirements_hash()
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                if f.read().strip() == current_hash:
+                    print("Dependencies unchanged since last check, skipping pip")
+                    return True
+
+        outdated = self.check_and_update_packages()
+        unchecked = self.unchecked_requirements()
+        for line in unchecked:
+            print(f"Unchecked: {line} (installing with pip -r {REQUIREMENTS_FILE})")
+        if outdated or unchecked:
+            # Непроверенные строки отдаем pip целым файлом: проверить их сами мы не можем
+            from_file = ["-r", os.path.join(self.repo_path, REQUIREMENTS_FILE)] if unchecked else []
+            print(f"Installing {len(outdated)} outdated package(s) and {len(unchecked)} unchecked line(s) in one pip run...")
+            result = subprocess.run(
+                [sys.executable, "-m", "pip", "install", *from_file, *outdated], cwd=self.repo_path
+            )
+            if result.returncode != 0:
+                print("Failed: pip install")
+                return False
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as f:
+            f.write(current_hash + "\n")
+        return True
 
     def ensure_gitignore(self):
         if not os.path.exists(".gitignore"):
@@ -179,6 +330,167 @@ class WiseacreUpdater:
         else:
             print("[=] .gitignore already exists")
 
+    def git(self, args, description, cwd=None):
+        """git-команда без shell; возвращает (успех, stdout)"""
+        print(f"Running: {description}...")
+        result = subprocess.run(
+            ["git", *args], capture_output=True, text=True, cwd=cwd or self.repo_path
+        )
+        if result.returncode != 0:
+            print(f"Failed: {description} - {result.stderr.strip()}")
+            return False, result.stderr
+        return True, result.stdout.strip()
+
+    def prepare_worktree(self, remote, branch):
+        """Выкладывает свежую ревизию в .deploy/<sha>, не трогая рабочий каталог"""
+        success, _ = self.git(["fetch", remote, branch], f"Fetching {remote}/{branch}")
+        if not success:
+            return None, None
+        success, sha = self.git(["rev-parse", "FETCH_HEAD"], "Resolving fetched revision")
+        if not success:
+            return None, None
+        path = os.path.join(self.repo_path, DEPLOY_DIR, sha[:12])
+        if not os.path.exists(path):
+            success, _ = self.git(["worktree", "add", "--detach", path, sha], f"Creating worktree {sha[:12]}")
+            if not success:
+                return None, None
+        return sha, path
+
+    def smoke_import(self, path):
+        """Импорт bot в новой ревизии: после ленивых синглтонов он не трогает данные"""
+        print("Running: Smoke import of the new revision...")
+        result = subprocess.run(
+            [sys.executable, "-c", "import bot"], capture_output=True, text=True, cwd=path
+        )
+        if result.returncode != 0:
+            print(f"Failed: Smoke import - {result.stderr.strip()}")
+            return False
+        print("Success: Smoke import")
+        return True
+
+    def start_bot(self, code_dir, ready_file=None, replaces_pid=None):
+        """Запускает бот из code_dir; рабочий каталог и данные остаются прежними"""
+        env = dict(os.environ)
+        if ready_file:
+            env[READY_ENV] = ready_file
+        if replaces_pid:
+            env[REPLACES_ENV] = str(replaces_pid)
+        log_file = open(os.path.join(self.repo_path, DEPLOY_DIR, f"{os.path.basename(code_dir)}.log"), "ab")
+        with log_file:
+            return subprocess.Popen(
+                [sys.executable, os.path.join(code_dir, "bot.py")],
+                cwd=self.repo_path,
+                env=env,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+
+    def wait_for_state(self, ready_file, wanted, process, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                print(f"Error: new bot exited with code {process.returncode}")
+                return False
+            state = read_state(ready_file)
+            # Без старого процесса бот проходит "warm" сразу и может не застать опроса
+            if state and state.get("state") in HANDOFF_STATES[HANDOFF_STATES.index(wanted):]:
+                return True
+            time.sleep(0.1)
+        print(f"Error: new bot did not reach state '{wanted}' in {timeout:.0f}s")
+        return False
+
+    @staticmethod
+    def _alive(pid):
+        """pid_alive, но свой завершившийся дочерний процесс (зомби) сначала забирается"""
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+        return pid_alive(pid)
+
+    def stop_process(self, pid, timeout):
+        """SIGTERM и ожидание выхода; по таймауту — SIGKILL"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while self._alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self._alive(pid):
+            print(f"Process {pid} did not stop in {timeout:.0f}s, killing it")
+            os.kill(pid, signal.SIGKILL)
+
+    def prune_worktrees(self, keep):
+        """Удаляет прежние ревизии из .deploy; логи остаются"""
+        deploy_dir = os.path.join(self.repo_path, DEPLOY_DIR)
+        keep_name = os.path.basename(keep)
+        for name in os.listdir(deploy_dir):
+            path = os.path.join(deploy_dir, name)
+            if os.path.isdir(path) and name != keep_name:
+                self.git(["worktree", "remove", "--force", path], f"Removing old worktree {name}")
+            elif name.endswith(".ready") and name != f"{keep_name}.ready":
+                os.remove(path)
+        self.git(["worktree", "prune"], "Pruning worktree metadata")
+
+    def handoff_update(self, remote="origin", branch=None, timeout=60.0, replaces_pid=None):
+        """Обновление без простоя: новая ревизия готовится рядом и принимает работу у старой"""
+        if branch is None:
+            success, branch = self.git(["rev-parse", "--abbrev-ref", "HEAD"], "Detecting current branch")
+            if not success:
+                return False
+        sha, path = self.prepare_worktree(remote, branch)
+        if sha is None:
+            return False
+        # Пакеты общие со старым ботом: ставить их рядом с работающим процессом нельзя,
+        # иначе неудачная передача и откат запустят старый код на новых версиях
+        new_revision = WiseacreUpdater(path)
+        new_revision.required_packages = self.required_packages
+        outdated = new_revision.check_and_update_packages()
+        # Непроверяемые строки считаем установленными, только если они не изменились
+        outdated += sorted(set(new_revision.unchecked_requirements()) - set(self.unchecked_requirements()))
+        if outdated:
+            print(f"Revision {sha[:12]} needs package changes: {', '.join(outdated)}")
+            print("Handoff aborted: stop the bot and run python updater.py to install them")
+            return False
+        if not self.smoke_import(path):
+            return False
+
+        old = read_state(os.path.join(self.repo_path, STATE_FILE)) or {}
+        old_pid = replaces_pid or old.get("pid")
+        if old_pid and not pid_alive(old_pid):
+            old_pid = None
+        if old_pid and old.get("code_dir") == path:
+            print(f"Revision {sha[:12]} is already running (pid {old_pid})")
+            return True
+
+        ready_file = os.path.join(self.repo_path, DEPLOY_DIR, f"{sha[:12]}.ready")
+        if os.path.exists(ready_file):
+            os.remove(ready_file)
+        process = self.start_bot(path, ready_file, old_pid)
+        print(f"Started new bot (pid {process.pid}) from {path}")
+        if not self.wait_for_state(ready_file, "warm", process, timeout):
+            self.stop_process(process.pid, timeout)
+            print("Update aborted, the running bot was not touched")
+            return False
+
+        if old_pid:
+            print(f"Stopping old bot (pid {old_pid})...")
+            self.stop_process(old_pid, timeout)
+        if not self.wait_for_state(ready_file, "serving", process, timeout):
+            self.stop_process(process.pid, timeout)
+            if old.get("code_dir") and os.path.isdir(old["code_dir"]):
+                print(f"Rolling back to {old['code_dir']}")
+                self.start_bot(old["code_dir"])
+            return False
+        print(f"New bot (pid {process.pid}) is serving revision {sha[:12]}")
+
+        # Рабочий каталог подтягиваем только fast-forward: локальные правки не трогаем
+        self.git(["merge", "--ff-only", sha], "Fast-forwarding working tree")
+        self.prune_worktrees(keep=path)
+        return True
+
     def run(self):
         print("Starting WISEACRE Auto-Updater...")
         print(f"Working directory: {self.repo_path}")
@@ -197,14 +509,36 @@ class WiseacreUpdater:
             if not self.update_repository():
                 return False
 
-        self.check_and_update_packages()
-        self.install_requirements()
+        if not self.install_requirements():
+            return False
 
         print("WISEACRE is fully updated and ready to use!")
         return True
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="WISEACRE updater")
+    parser.add_argument(
+        "--handoff",
+        action="store_true",
+        help="prepare the new revision in a worktree and hand over from the running bot without downtime "
+        "(only when it needs no package changes)",
+    )
+    parser.add_argument("--remote", default="origin")
+    parser.add_argument("--branch", help="branch to deploy (default: current branch)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for each handoff step")
+    parser.add_argument("--pid", type=int, help="pid of a running bot that does not write data/bot.state.json")
+    args = parser.parse_args()
+
     updater = WiseacreUpdater()
-    success = updater.run()
+    if args.handoff:
+        success = updater.check_python_version() and updater.handoff_update(
+            args.remote, args.branch, args.timeout, args.pid
+        )
+    else:
+        success = updater.run()
     sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
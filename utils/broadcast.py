@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# utils/broadcast.py
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from telegram.error import Forbidden, NetworkError, RetryAfter
+from telegram.ext import CallbackContext
+from utils.schedule_manager import MOSCOW_TZ, schedule_manager
+
+logger = logging.getLogger(__name__)
+
+MORNING = "morning"
+EVENING = "evening"
+
+
+def collect_subscribers(user_data: Dict[int, Dict], mode: str) -> Dict[Optional[str], List[int]]:
+    """Группирует подписчиков рассылки по группе расписания"""
+    by_group: Dict[Optional[str], List[int]] = defaultdict(list)
+    for user_id, data in user_data.items():
+        if data.get("subscription") == mode:
+            by_group[data.get("group")].append(user_id)
+    return by_group
+
+
+async def _send_with_retry(bot, chat_id: int, text: str, max_attempts: int) -> str:
+    """Отправляет одно сообщение; возвращает sent, blocked или failed"""
+    delay = 1.0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            await bot.send_message(chat_id, text)
+            return "sent"
+        except Forbidden:
+            return "blocked"
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+        except NetworkError as e:
+            if attempt == max_attempts:
+                logger.warning("Рассылка в чат %s не удалась: %s", chat_id, e)
+                break
+            await asyncio.sleep(delay)
+            delay *= 2
+    return "failed"
+
+
+async def deliver(
+    bot,
+    messages: List[Tuple[int, str]],
+    batch_size: int = 25,
+    max_attempts: int = 3,
+) -> Dict[str, List[int]]:
+    """Отправляет сообщения пачками не чаще batch_size в секунду"""
+    results: Dict[str, List[int]] = defaultdict(list)
+    for start in range(0, len(messages), batch_size):
+        batch = messages[start:start + batch_size]
+        started = time.monotonic()
+        statuses = await asyncio.gather(
+            *(_send_with_retry(bot, chat_id, text, max_attempts) for chat_id, text in batch)
+        )
+        for (chat_id, _), status in zip(batch, statuses):
+            results[status].append(chat_id)
+        elapsed = time.monotonic() - started
+        if start + batch_size < len(messages) and elapsed < 1.0:
+            await asyncio.sleep(1.0 - elapsed)
+    return results
+
+
+async def broadcast_job(context: CallbackContext) -> None:
+    """Ежедневная рассылка: каждое сообщение рисуется один раз на группу и дату"""
+    mode = context.job.data["mode"]
+    batch_size = context.job.data.get("batch_size", 25)
+    target_date = datetime.now(MOSCOW_TZ).date()
+    if mode == EVENING:
+        target_date += timedelta(days=1)
+
+    loop = asyncio.get_running_loop()
+    messages: List[Tuple[int, str]] = []
+    for group, user_ids in collect_subscribers(context.application.user_data, mode).items():
+        try:
+            # Загрузка расписания группы может разбирать JSON — выполняем в пуле потоков
+            text = await loop.run_in_executor(
+                None, schedule_manager.get_schedule_for_day, target_date, group
+            )
+        except KeyError:
+            logger.warning("Рассылка пропущена: нет расписания группы %s", group)
+            continue
+        messages.extend((user_id, text) for user_id in user_ids)
+
+    results = await deliver(context.bot, messages, batch_size)
+    # Кто заблокировал бота, тому больше не пишем
+    blocked = results.get("blocked", [])
+    for user_id in blocked:
+        context.application.user_data[user_id].pop("subscription", None)
+    if blocked:
+        context.application.mark_data_for_update_persistence(user_ids=blocked)
+    logger.info(
+        "Рассылка %s на %s: отправлено %d, заблокировали бота %d, ошибок %d",
+        mode, target_date, len(results.get("sent", [])),
+        len(results.get("blocked", [])), len(results.get("failed", [])),
+    )
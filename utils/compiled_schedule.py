@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# utils/compiled_schedule.py
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+PAIR_FIELDS = ("time", "subject", "type", "room", "teacher")
+SECTIONS = ("odd_week", "even_week", "special_dates")
+
+# Заголовок файла: сигнатура, версия, mtime_ns и размер исходного JSON,
+# длина JSON-шапки, число уникальных пар и число ссылок на пары в днях
+MAGIC = b"WSCH"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxQQIII")
+
+logger = logging.getLogger(__name__)
+
+
+class Lesson:
+    """Одна пара. Поля — ссылки на общие интернированные строки; доступ как к dict"""
+
+    __slots__ = PAIR_FIELDS
+
+    def __init__(self, time: str, subject: str, type: str, room: str, teacher: str):
+        self.time = time
+        self.subject = subject
+        self.type = type
+        self.room = room
+        self.teacher = teacher
+
+    def __getitem__(self, key: str) -> str:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in PAIR_FIELDS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in PAIR_FIELDS else default
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in PAIR_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Lesson) and all(
+            getattr(self, field) == getattr(other, field) for field in PAIR_FIELDS
+        )
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, field) for field in PAIR_FIELDS))
+
+    def __repr__(self) -> str:
+        return f"Lesson({self.to_dict()!r})"
+
+
+def cache_path(schedule_file: str) -> str:
+    return f"{schedule_file}.bin"
+
+
+def _compile_tables(schedule_data: Dict) -> Tuple[Dict, array, array]:
+    """Раскладывает расписание на таблицу строк, таблицу уникальных пар и списки пар по дням"""
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+    lesson_ids: Dict[Tuple[int, ...], int] = {}
+    lessons = array("I")
+    slots = array("I")
+    days: Dict[str, Dict[str, List[int]]] = {}
+
+    def string_id(value) -> int:
+        value = str(value)
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    for section in SECTIONS:
+        days[section] = {}
+        for day, pairs in schedule_data.get(section, {}).items():
+            start = len(slots)
+            for pair in pairs:
+                key = tuple(string_id(pair[field]) for field in PAIR_FIELDS)
+                if key not in lesson_ids:
+                    lesson_ids[key] = len(lesson_ids)
+                    lessons.extend(key)
+                slots.append(lesson_ids[key])
+            days[section][day] = [start, len(pairs)]
+
+    meta = {key: value for key, value in schedule_data.items() if key not in SECTIONS}
+    header = {"meta": meta, "strings": strings, "days": days, "byteorder": sys.byteorder}
+    return header, lessons, slots
+
+
+def _materialize(header: Dict, lessons, slots) -> Dict:
+    """Собирает расписание в прежнем виде, но из общих объектов Lesson"""
+    strings = [sys.intern(value) for value in header["strings"]]
+    fields = len(PAIR_FIELDS)
+    objects = [
+        Lesson(*(strings[lessons[i * fields + j]] for j in range(fields)))
+        for i in range(len(lessons) // fields)
+    ]
+    schedule_data = dict(header["meta"])
+    for section, section_days in header["days"].items():
+        schedule_data[section] = {
+            day: [objects[slots[start + i]] for i in range(count)]
+            for day, (start, count) in section_days.items()
+        }
+    return schedule_data
+
+
+def write_compiled(schedule_file: str, schedule_data: Dict, source: os.stat_result) -> Dict:
+    """Компилирует расписание, атомарно пишет кеш рядом с JSON и возвращает результат"""
+    header, lessons, slots = _compile_tables(schedule_data)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    # Массивы выравниваются по 4 байта, чтобы при чтении делать cast без копирования
+    header_bytes += b" " * (-(HEADER.size + len(header_bytes)) % 4)
+    target = cache_path(schedule_file)
+    tmp_file = f"{target}.tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, source.st_mtime_ns, source.st_size,
+                len(header_bytes), len(lessons), len(slots),
+            ))
+            f.write(header_bytes)
+            lessons.tofile(f)
+            slots.tofile(f)
+        os.replace(tmp_file, target)
+    except OSError as e:
+        logger.debug("Не удалось записать кеш расписания %s: %s", target, e)
+    return _materialize(header, lessons, slots)
+
+
+def read_compiled(schedule_file: str, source: os.stat_result) -> Optional[Dict]:
+    """Загружает кеш через mmap; None, если кеша нет или он построен по другому JSON"""
+    try:
+        f = open(cache_path(schedule_file), "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+    with mapped:
+        if len(mapped) < HEADER.size:
+            return None
+        magic, version, mtime_ns, size, header_len, lesson_words, slot_count = HEADER.unpack_from(mapped)
+        if (magic, version, mtime_ns, size) != (MAGIC, VERSION, source.st_mtime_ns, source.st_size):
+            return None
+        body = HEADER.size + header_len
+        if len(mapped) != body + 4 * (lesson_words + slot_count):
+            return None
+        # Заголовок файла цел, но тело может быть повреждено: тогда кеш
+        # пересобирается из JSON, а не роняет каждый запуск бота
+        try:
+            header = json.loads(mapped[HEADER.size:body].decode("utf-8"))
+            if header.get("byteorder") != sys.byteorder:
+                return None
+            # Все представления буфера освобождаются до закрытия mmap
+            with memoryview(mapped) as raw, raw[body:] as tail, tail.cast("I") as words, \
+                    words[:lesson_words] as lessons, words[lesson_words:] as slots:
+                return _materialize(header, lessons, slots)
+        except (ValueError, LookupError, TypeError, AttributeError) as e:
+            logger.warning("Кеш расписания %s поврежден (%s), пересобираю из JSON", cache_path(schedule_file), e)
+            return None
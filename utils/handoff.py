@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# utils/handoff.py
+"""Передача работы от старого процесса бота новому без потери обновлений.
+
+Модуль использует только стандартную библиотеку: его импортирует и бот,
+и updater.py, который запускается до установки зависимостей.
+
+Порядок (его ведет updater.py --handoff):
+1. новый процесс запускается с WISEACRE_READY_FILE и WISEACRE_REPLACES_PID,
+   импортирует код, собирает приложение, загружает расписание (оно только
+   читается) и пишет в ready-файл состояние "warm";
+2. updater останавливает старый процесс сигналом SIGTERM — тот дообрабатывает
+   полученные обновления и подтверждает offset;
+3. новый процесс дожидается выхода старого и только после этого читает
+   изменяемые данные — user_data, базу и журналы (старый процесс мог писать
+   в них до последнего), начинает polling или поднимает webhook и пишет
+   состояние "serving".
+Неподтвержденные обновления Telegram хранит у себя, поэтому пауза между
+шагами 2 и 3 ничего не теряет.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+
+STATE_FILE = os.getenv("BOT_STATE_FILE", "data/bot.state.json")
+READY_ENV = "WISEACRE_READY_FILE"
+REPLACES_ENV = "WISEACRE_REPLACES_PID"
+
+
+def write_state(path: str, state: Dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, path)
+
+
+def read_state(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def wait_for_predecessor(code_dir: str) -> None:
+    """Вызывается до загрузки данных: сообщает о готовности и ждет выхода старого процесса"""
+    ready_file = os.getenv(READY_ENV)
+    if ready_file:
+        write_state(ready_file, {"pid": os.getpid(), "code_dir": code_dir, "state": "warm"})
+    replaces = os.getenv(REPLACES_ENV)
+    if replaces:
+        while pid_alive(int(replaces)):
+            time.sleep(0.05)
+
+
+async def announce_serving(app, code_dir: str) -> None:
+    """Фоновая задача: как только приложение принимает обновления, записывает состояние"""
+    while not (app.running and (app.updater is None or app.updater.running)):
+        await asyncio.sleep(0.05)
+    state = {"pid": os.getpid(), "code_dir": code_dir, "state": "serving", "since": time.time()}
+    write_state(STATE_FILE, state)
+    ready_file = os.getenv(READY_ENV)
+    if ready_file:
+        write_state(ready_file, state)
+
+
+def clear_state() -> None:
+    """Удаляет файл состояния, если он принадлежит текущему процессу"""
+    state = read_state(STATE_FILE)
+    if state and state.get("pid") == os.getpid():
+        try:
+            os.remove(STATE_FILE)
+        except OSError:
+            pass
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# utils/hashing.py
+
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import List
+from config import HASH_CACHE_SIZE, STUDENT_HASH_KEY
+
+_KEY = STUDENT_HASH_KEY.encode()
+
+# Схема хранения хешей: sha256 — старая, hmac-sha256 — HMAC(ключ, sha256(номер))
+HASH_SCHEME = "hmac-sha256" if _KEY else "sha256"
+
+
+def legacy_hash(student_id: str) -> str:
+    """Старый несоленый SHA-256 номера студбилета"""
+    return hashlib.sha256(student_id.strip().encode()).hexdigest()
+
+
+def upgrade_hash(legacy_digest: str) -> str:
+    """Переводит старый хеш в HMAC-схему без знания исходного номера"""
+    return hmac.new(_KEY, legacy_digest.encode(), hashlib.sha256).hexdigest()
+
+
+@lru_cache(maxsize=HASH_CACHE_SIZE)
+def hash_student_id(student_id: str) -> str:
+    """Хеширует номер студбилета для безопасности; недавние результаты кэшируются"""
+    digest = legacy_hash(student_id)
+    return upgrade_hash(digest) if _KEY else digest
+
+
+def hash_many(student_ids: List[str]) -> List[str]:
+    """Хеширует пачку номеров; используется в пуле процессов при массовом импорте"""
+    return [hash_student_id(student_id) for student_id in student_ids]
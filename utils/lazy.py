@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# utils/lazy.py
+
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyService(Generic[T]):
+    """Синглтон, который создается при первом обращении или явном start().
+
+    Импорт модуля не трогает файловую систему. bot.main запускает сервисы
+    заранее и параллельно, а скрипты вроде roster.py получают их по первому
+    обращению к атрибуту. warm — необязательный прогрев после создания
+    (например, загрузка индекса базы).
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], warm: Optional[Callable[[T], object]] = None):
+        self.name = name
+        self._factory = factory
+        self._warm = warm
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                started = time.perf_counter()
+                instance = self._factory()
+                if self._warm is not None:
+                    self._warm(instance)
+                self.init_seconds = time.perf_counter() - started
+                self._instance = instance
+            return self._instance
+
+    def start(self) -> float:
+        """Создает и прогревает сервис; возвращает время инициализации в секундах"""
+        self.get()
+        return self.init_seconds
+
+    def replace(self, instance: T) -> None:
+        """Подставляет готовый экземпляр (например, клиента владельца в рабочем процессе)"""
+        with self._lock:
+            self._instance = instance
+            self.init_seconds = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        state = "started" if self.started else "lazy"
+        return f"<LazyService {self.name} ({state})>"
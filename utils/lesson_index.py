@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# utils/lesson_index.py
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+# Больше любого символа имени: верхняя граница диапазона имен с заданным началом
+PREFIX_END = chr(0x10FFFF)
+TIME_RANGE_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})")
+
+
+def parse_time_range(text: str) -> Optional[Tuple[int, int]]:
+    """'09:00-10:30' -> (540, 630) — минуты от начала дня; None, если не разобрать"""
+    found = TIME_RANGE_RE.search(text)
+    if not found:
+        return None
+    start_h, start_m, end_h, end_m = map(int, found.groups())
+    return start_h * 60 + start_m, end_h * 60 + end_m
+
+
+def moment(day: date, minutes: int = 0) -> int:
+    """Абсолютное время в минутах: позволяет сравнивать пары разных дней одним числом"""
+    return day.toordinal() * MINUTES_PER_DAY + minutes
+
+
+def moment_of(now: datetime) -> int:
+    return moment(now.date(), now.hour * 60 + now.minute)
+
+
+def clock(at: int) -> str:
+    """Время суток абсолютного момента: 630 -> '10:30'"""
+    minutes = at % MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class LessonSlot(NamedTuple):
+    start: int
+    end: int
+    day: date
+    lesson: Dict
+
+
+class IntervalIndex:
+    """Пары, отсортированные по началу; запросы — бинарный поиск по массиву начал"""
+
+    def __init__(self, slots: List[LessonSlot]):
+        self.slots = sorted(slots, key=lambda slot: slot.start)
+        self.starts = [slot.start for slot in self.slots]
+
+    def current(self, at: int) -> Optional[LessonSlot]:
+        """Пара, идущая в момент at"""
+        position = bisect_right(self.starts, at)
+        if position and self.slots[position - 1].end > at:
+            return self.slots[position - 1]
+        return None
+
+    def after(self, at: int, limit: int = 1) -> List[LessonSlot]:
+        """Ближайшие пары, начинающиеся позже at (пара, начавшаяся ровно в at, — уже текущая)"""
+        position = bisect_right(self.starts, at)
+        return self.slots[position:position + limit]
+
+    def between(self, start: int, end: int) -> List[LessonSlot]:
+        """Пары, начинающиеся в полуинтервале [start, end)"""
+        return self.slots[bisect_left(self.starts, start):bisect_left(self.starts, end)]
+
+
+class LessonIndex:
+    """Индексы пар семестра: общий, по аудиториям и по преподавателям"""
+
+    def __init__(self, days: Iterable[Tuple[date, List[Dict]]]):
+        parsed: Dict[str, Optional[Tuple[int, int]]] = {}
+        slots: List[LessonSlot] = []
+        by_room: Dict[str, List[LessonSlot]] = defaultdict(list)
+        by_teacher: Dict[str, List[LessonSlot]] = defaultdict(list)
+        for day, lessons in days:
+            for lesson in lessons:
+                time_text = lesson["time"]
+                if time_text not in parsed:
+                    parsed[time_text] = parse_time_range(time_text)
+                if parsed[time_text] is None:
+                    continue
+                start, end = parsed[time_text]
+                slot = LessonSlot(moment(day, start), moment(day, end), day, lesson)
+                slots.append(slot)
+                by_room[str(lesson["room"]).strip().lower()].append(slot)
+                by_teacher[str(lesson["teacher"]).strip().lower()].append(slot)
+        self.all = IntervalIndex(slots)
+        self.rooms = {room: IntervalIndex(room_slots) for room, room_slots in by_room.items()}
+        self.teachers = {name: IntervalIndex(teacher_slots) for name, teacher_slots in by_teacher.items()}
+        self.teacher_names = sorted(self.teachers)
+
+    def room(self, room: str) -> Optional[IntervalIndex]:
+        return self.rooms.get(room.strip().lower())
+
+    def teacher(self, query: str) -> List[Tuple[str, IntervalIndex]]:
+        """Преподаватели, чье имя начинается с query или совпадает с ним (без учета регистра)"""
+        query = query.strip().lower()
+        if query in self.teachers:
+            return [(query, self.teachers[query])]
+        names = self.teacher_names[
+            bisect_left(self.teacher_names, query):bisect_right(self.teacher_names, query + PREFIX_END)
+        ]
+        return [(name, self.teachers[name]) for name in names]
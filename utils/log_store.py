@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# utils/log_store.py
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+from collections import defaultdict
+from typing import BinaryIO, Dict, Iterable, List, Optional
+from utils.metrics import metrics
+
+_SEGMENT_RE = re.compile(r"^(\d{8})-(\d{4})\.jsonl(\.gz)?$")
+
+
+class LogStore:
+    """Журнал событий в формате JSON Lines, разбитый на сегменты.
+
+    Сегмент закрывается при смене суток или превышении max_segment_bytes,
+    после чего рядом с ним пишется индекс смещений записей по пользователям
+    (<segment>.idx), а сам сегмент по желанию сжимается в gzip. Старые
+    сегменты сверх max_segments удаляются.
+    """
+
+    def __init__(
+        self,
+        logs_dir: str = "data/logs",
+        max_segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 365,
+        compress: bool = True,
+    ):
+        self.logs_dir = logs_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._segment: Optional[BinaryIO] = None
+        self._segment_name = ""
+        self._segment_period = ""
+        self._segment_size = 0
+        self._segment_index: Dict[str, List[int]] = defaultdict(list)
+        os.makedirs(self.logs_dir, exist_ok=True)
+        self._finalize_leftovers()
+
+    def _segments(self) -> List[str]:
+        """Имена сегментов в хронологическом порядке"""
+        return sorted(name for name in os.listdir(self.logs_dir) if _SEGMENT_RE.match(name))
+
+    def _finalize_leftovers(self):
+        """Закрывает сегменты, оставшиеся незавершенными после прошлого запуска"""
+        for name in self._segments():
+            if name.endswith(".jsonl") and not os.path.exists(self._index_path(name)):
+                index = self._scan_segment(name)
+                self._finish_segment(name, index)
+
+    def _index_path(self, name: str) -> str:
+        base = name[:-3] if name.endswith(".gz") else name
+        return os.path.join(self.logs_dir, f"{base}.idx")
+
+    def _scan_segment(self, name: str) -> Dict[str, List[int]]:
+        index: Dict[str, List[int]] = defaultdict(list)
+        offset = 0
+        with open(os.path.join(self.logs_dir, name), "rb") as f:
+            for line in f:
+                try:
+                    index[json.loads(line)["user"]].append(offset)
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        return index
+
+    def _finish_segment(self, name: str, index: Dict[str, List[int]]):
+        """Пишет индекс сегмента, сжимает его и применяет ограничение по количеству"""
+        with open(self._index_path(name), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        if self.compress:
+            path = os.path.join(self.logs_dir, name)
+            with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        segments = self._segments()
+        for name in segments[: max(0, len(segments) - self.max_segments)]:
+            os.remove(os.path.join(self.logs_dir, name))
+            if os.path.exists(self._index_path(name)):
+                os.remove(self._index_path(name))
+
+    def _rotate(self, period: str):
+        """Закрывает текущий сегмент и открывает следующий"""
+        if self._segment is not None:
+            # Сегмент отцепляется до сжатия: если оно упадет, следующая запись откроет новый
+            segment, self._segment = self._segment, None
+            segment.close()
+            self._finish_segment(self._segment_name, self._segment_index)
+        seq = 0
+        for name in self._segments():
+            match = _SEGMENT_RE.match(name)
+            if match.group(1) == period:
+                seq = max(seq, int(match.group(2)) + 1)
+        self._segment_name = f"{period}-{seq:04d}.jsonl"
+        self._segment_period = period
+        self._segment = open(os.path.join(self.logs_dir, self._segment_name), "ab")
+        self._segment_size = 0
+        self._segment_index = defaultdict(list)
+
+    def append_many(self, records: Iterable[Dict]):
+        """Дописывает записи в текущий сегмент, при необходимости ротируя его"""
+        with self._lock:
+            for record in records:
+                period = record["ts"][:10].replace("-", "")
+                if (
+                    self._segment is None
+                    or period != self._segment_period
+                    or self._segment_size >= self.max_segment_bytes
+                ):
+                    self._rotate(period)
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                self._segment_index[record["user"]].append(self._segment_size)
+                self._segment.write(line)
+                self._segment_size += len(line)
+            if self._segment is not None:
+                self._segment.flush()
+                metrics.file_writes.inc("user_log")
+
+    def get_user_history(self, user_key: str, limit: int = 50) -> List[Dict]:
+        """Возвращает последние limit записей пользователя, читая только его смещения"""
+        with self._lock:
+            history: List[Dict] = []
+            if self._segment is not None:
+                history = self._read_offsets(
+                    self._segment_name, self._segment_index.get(user_key, []), limit
+                )
+            for name in reversed(self._segments()):
+                if len(history) >= limit:
+                    break
+                if name == self._segment_name:
+                    continue
+                index_path = self._index_path(name)
+                if not os.path.exists(index_path):
+                    continue
+                with open(index_path, "r", encoding="utf-8") as f:
+                    offsets = json.load(f).get(user_key, [])
+                history = self._read_offsets(name, offsets, limit - len(history)) + history
+            return history
+
+    def _read_offsets(self, name: str, offsets: List[int], limit: int) -> List[Dict]:
+        if not offsets or limit <= 0:
+            return []
+        path = os.path.join(self.logs_dir, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        records = []
+        with opener(path, "rb") as f:
+            for offset in offsets[-limit:]:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def close(self):
+        """Закрывает и завершает текущий сегмент"""
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+                self._finish_segment(self._segment_name, self._segment_index)
+                self._segment_name = ""
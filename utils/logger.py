@@ -1,37 +1,140 @@
 #!/usr/bin/env python3
 # utils/logger.py
 
-import os
-import json
+import atexit
+import logging
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List
 from telegram import User
+from utils.lazy import LazyService
+from utils.log_store import LogStore
+from utils.metrics import metrics
+
+_STOP = object()
+
+_log = logging.getLogger(__name__)
 
 
 class UserLogger:
-    def __init__(self, logs_dir: str = "data/logs"):
+    def __init__(
+        self,
+        logs_dir: str = "data/logs",
+        flush_interval: float = 1.0,
+        flush_size: int = 256,
+        max_segment_bytes: int = 16 * 1024 * 1024,
+        compress: bool = True,
+        max_queue: int = 10000,
+        max_write_attempts: int = 3,
+    ):
         self.logs_dir = logs_dir
-        self._ensure_logs_directory()
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_write_attempts = max_write_attempts
+        self.store = LogStore(logs_dir, max_segment_bytes=max_segment_bytes, compress=compress)
+        # Очередь ограничена: если диск не успевает или недоступен, новые записи
+        # отбрасываются со счетчиком, а не копятся в памяти
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._atexit_registered = False
+    
+    def _get_user_key(self, user: User) -> str:
+        """Возвращает ключ пользователя в журнале"""
+        return user.username or f"user_{user.id}"
     
-    def _ensure_logs_directory(self):
-        """Создает папку для логов если ее нет"""
-        if not os.path.exists(self.logs_dir):
-            os.makedirs(self.logs_dir)
+    def _start_writer(self):
+        """Запускает фоновый поток записи при первом сообщении (и заново, если он умер)"""
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._writer_loop, name="user-logger", daemon=True)
+            self._writer.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
     
-    def _get_user_log_file(self, user: User) -> str:
-        """Возвращает путь к файлу лога пользователя"""
-        username = user.username or f"user_{user.id}"
-        return os.path.join(self.logs_dir, f"{username}.txt")
+    def _flush(self, pending: List[Dict], attempts: int) -> int:
+        """Пишет пачку; возвращает число неудачных попыток (0 — записано или отброшено)"""
+        try:
+            self.store.append_many(pending)
+            return 0
+        except Exception:
+            attempts += 1
+            if attempts < self.max_write_attempts:
+                _log.exception("Не удалось записать журнал (попытка %s), повторю", attempts)
+                return attempts
+            _log.exception("Журнал не записан после %s попыток, %s записей отброшено", attempts, len(pending))
+            metrics.dropped_log_records.inc("write_error", amount=len(pending))
+            return 0
+    
+    def _writer_loop(self):
+        """Копит записи и сбрасывает их пачками по размеру или по времени.
+
+        Ошибка записи (диск заполнен, сбой сжатия сегмента) не останавливает поток:
+        пачка повторяется на следующем сбросе, после max_write_attempts — отбрасывается.
+        """
+        pending: List[Dict] = []
+        attempts = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            
+            if item is _STOP:
+                if pending:
+                    # При остановке — одна последняя попытка
+                    self._flush(pending, self.max_write_attempts - 1)
+                try:
+                    self.store.close()
+                except Exception:
+                    _log.exception("Не удалось закрыть журнал")
+                return
+            if item is not None:
+                pending.append(item)
+            
+            # После ошибки следующая попытка — только по таймеру, без повторов подряд
+            if (len(pending) >= self.flush_size and not attempts) or time.monotonic() >= deadline:
+                if pending:
+                    attempts = self._flush(pending, attempts)
+                    if not attempts:
+                        pending = []
+                deadline = time.monotonic() + self.flush_interval
+    
+    def close(self):
+        """Дописывает очередь на диск и останавливает фоновый поток"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        self._queue.put(_STOP)
+        writer.join()
     
     def log_message(self, user: User, message_type: str, content: str):
-        """Логирует сообщение пользователя в текстовый файл"""
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message_type.upper()}: {content}\n"
+        """Ставит сообщение пользователя в очередь на запись в журнал"""
+        record = {
+            "ts": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "user": self._get_user_key(user),
+            "user_id": user.id,
+            "type": message_type.upper(),
+            "content": content,
+        }
         
-        log_file = self._get_user_log_file(user)
-        
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_entry + "\n")  
+        self._start_writer()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            metrics.dropped_log_records.inc("queue_full")
+    
+    def get_user_history(self, user: User, limit: int = 50) -> List[Dict]:
+        """Возвращает последние записи пользователя"""
+        return self.store.get_user_history(self._get_user_key(user), limit)
     
     def log_authentication(self, user: User, student_id: str, success: bool, message: str):
         """Логирует попытку аутентификации"""
@@ -47,4 +150,4 @@ class UserLogger:
         self.log_message(user, "MESSAGE", message)
 
 
-logger = UserLogger()
+logger = LazyService("logger", UserLogger)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# utils/metrics.py
+
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # значения меток -> [счетчики по корзинам..., сумма, количество]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labels, values, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+                labels = _format_labels(self.labels, values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-1]:g}")
+                plain = _format_labels(self.labels, values)
+                lines.append(f"{self.name}_sum{plain} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{plain} {series[-1]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.handler_latency = Histogram(
+            "wiseacre_handler_latency_seconds", "Время работы обработчика", ("handler",)
+        )
+        self.handler_errors = Counter(
+            "wiseacre_handler_errors_total", "Исключения в обработчиках", ("handler",)
+        )
+        self.db_lookups = Counter(
+            "wiseacre_db_lookups_total", "Обращения к хранилищу студбилетов", ("operation",)
+        )
+        self.file_writes = Counter(
+            "wiseacre_file_writes_total", "Операции записи в файлы", ("target",)
+        )
+        self.cache_requests = Counter(
+            "wiseacre_cache_requests_total", "Обращения к кэшам", ("cache", "result")
+        )
+        self.dropped_requests = Counter(
+            "wiseacre_dropped_requests_total", "Запросы без ответа: лимит или дубликат", ("reason",)
+        )
+        self.dropped_log_records = Counter(
+            "wiseacre_dropped_log_records_total", "Записи журнала, не попавшие на диск", ("reason",)
+        )
+        self._metrics = [
+            self.handler_latency,
+            self.handler_errors,
+            self.db_lookups,
+            self.file_writes,
+            self.cache_requests,
+            self.dropped_requests,
+            self.dropped_log_records,
+        ]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_handler(callback):
+    """Декоратор асинхронного обработчика: гистограмма задержки и счетчик ошибок"""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            metrics.handler_errors.inc(name)
+            raise
+        finally:
+            metrics.handler_latency.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("ascii")
+            + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str = "127.0.0.1", port: int = 9108) -> asyncio.AbstractServer:
+    """Поднимает HTTP-эндпоинт /metrics в текстовом формате Prometheus"""
+    return await asyncio.start_server(_handle_connection, host, port)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# utils/persistence.py
+
+import asyncio
+import glob
+import json
+import os
+from copy import deepcopy
+from typing import Dict, List, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Ключи user_data, которые не попадают на диск (исходный номер студбилета)
+PRIVATE_KEYS = ("student_id",)
+
+
+def partition_files(filepath: str) -> List[str]:
+    """Файлы рабочих процессов: <filepath>.<номер>"""
+    return sorted(
+        path for path in glob.glob(f"{glob.escape(filepath)}.*") if path.rsplit(".", 1)[-1].isdigit()
+    )
+
+
+def read_user_data(paths: List[str]) -> Tuple[Dict[int, Dict], int]:
+    """Читает журналы от старых к новым по mtime; возвращает данные и число прочитанных строк"""
+    user_data: Dict[int, Dict] = {}
+    lines = 0
+    for path in sorted((path for path in paths if os.path.exists(path)), key=os.path.getmtime):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                if record.get("d") is None:
+                    user_data.pop(record["u"], None)
+                else:
+                    user_data[record["u"]] = record["d"]
+                lines += 1
+    return user_data, lines
+
+
+def write_user_data(path: str, user_data: Dict[int, Dict]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for user_id, data in user_data.items():
+            f.write(f'{{"u": {user_id}, "d": {json.dumps(data, ensure_ascii=False, sort_keys=True)}}}\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def repartition(filepath: str, count: int) -> List[str]:
+    """Раскладывает user_data по файлам рабочих процессов по user_id % count.
+
+    Вызывается фронтом до запуска рабочих; возвращает пути их файлов.
+    """
+    sources = [filepath] + partition_files(filepath)
+    user_data, _ = read_user_data(sources)
+    targets = [f"{filepath}.{index}" for index in range(count)]
+    for index, target in enumerate(targets):
+        write_user_data(target, {user_id: data for user_id, data in user_data.items() if user_id % count == index})
+    for path in sources:
+        if path not in targets and os.path.exists(path):
+            os.remove(path)
+    return targets
+
+
+class JournalPersistence(BasePersistence):
+    """Хранит только user_data в JSON Lines файле, дописывая изменившиеся записи.
+
+    Application сам раз в update_interval секунд передает данные пользователей,
+    у которых были обновления. Запись попадает в файл, только если данные
+    действительно изменились; строки одной пачки пишутся одним вызовом write.
+    Файл сжимается (последняя запись на пользователя) при запуске и остановке,
+    если в нем накопилось заметно больше строк, чем пользователей.
+    """
+
+    def __init__(self, filepath: str = "data/user_data.jsonl", update_interval: float = 30):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.filepath = filepath
+        self._user_data: Optional[Dict[int, Dict]] = None
+        self._persisted: Dict[int, str] = {}
+        self._lines = 0
+        self._pending: List[str] = []
+        self._flush_scheduled = False
+
+    def _load(self):
+        # Файлы, оставшиеся после работы в режиме нескольких процессов, сливаются в один
+        leftovers = partition_files(self.filepath)
+        self._user_data, self._lines = read_user_data([self.filepath] + leftovers)
+        self._persisted = {
+            user_id: json.dumps(data, ensure_ascii=False, sort_keys=True)
+            for user_id, data in self._user_data.items()
+        }
+        self._compact_if_needed(force=bool(leftovers))
+        for path in leftovers:
+            os.remove(path)
+
+    def _compact_if_needed(self, force: bool = False):
+        if not force and self._lines <= 2 * len(self._persisted) + 100:
+            return
+        tmp_file = f"{self.filepath}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for user_id, payload in self._persisted.items():
+                f.write(f'{{"u": {user_id}, "d": {payload}}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.filepath)
+        self._lines = len(self._persisted)
+
+    def _write_pending(self):
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(self.filepath, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+        self._lines += len(lines)
+
+    def _schedule_write(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._write_pending)
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        if self._user_data is None:
+            self._load()
+        return deepcopy(self._user_data)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        public = {key: value for key, value in data.items() if key not in PRIVATE_KEYS}
+        payload = json.dumps(public, ensure_ascii=False, sort_keys=True, default=str)
+        if self._persisted.get(user_id) == payload:
+            return
+        self._persisted[user_id] = payload
+        self._user_data[user_id] = public
+        self._pending.append(f'{{"u": {user_id}, "d": {payload}}}\n')
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if self._persisted.pop(user_id, None) is None:
+            return
+        self._user_data.pop(user_id, None)
+        self._pending.append(f'{{"u": {user_id}, "d": null}}\n')
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        self._write_pending()
+        self._compact_if_needed()
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
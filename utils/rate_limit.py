@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# utils/rate_limit.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+
+class TokenBucketLimiter:
+    """Token bucket на ключ (пользователь, чат): rate токенов в секунду, запас burst"""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # ключ -> [токены, момент последнего пополнения]
+        self._buckets: Dict[Hashable, List[float]] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [float(self.burst), now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _prune(self, now: float):
+        """Удаляет полностью восстановившиеся корзины — они ничем не отличаются от новых"""
+        refill_time = self.burst / self.rate if self.rate else float("inf")
+        for key in [key for key, (_, last) in self._buckets.items() if now - last >= refill_time]:
+            del self._buckets[key]
+
+
+class ResponseDeduplicator:
+    """Склеивает одинаковые запросы: пока ответ готовится и еще window секунд после
+    отправки повторы с тем же ключом не порождают новый ответ."""
+
+    def __init__(self, window: float = 3.0, max_keys: int = 100_000):
+        self.window = window
+        self.max_keys = max_keys
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._recent: Dict[Hashable, float] = {}
+
+    async def run(self, key: Hashable, respond: Callable[[], Awaitable]) -> bool:
+        """Выполняет respond, если такой ответ не отправляется и не был отправлен недавно.
+
+        Возвращает True, если ответ отправил именно этот вызов. Если отправка упала,
+        ключ не считается недавним, а ждавшие ее повторы пробуют ответить сами.
+        """
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            if await asyncio.shield(inflight):
+                return False
+        now = time.monotonic()
+        if self._recent.get(key, 0.0) > now:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        succeeded = False
+        try:
+            await respond()
+            succeeded = True
+            if len(self._recent) >= self.max_keys:
+                self._recent = {k: until for k, until in self._recent.items() if until > now}
+            self._recent[key] = time.monotonic() + self.window
+        finally:
+            del self._inflight[key]
+            future.set_result(succeeded)
+        return True
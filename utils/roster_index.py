@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# utils/roster_index.py
+
+import mmap
+import os
+import struct
+from typing import Iterable, Optional
+
+# Файл: сигнатура, версия, число записей; затем отсортированные 32-байтные дайджесты
+MAGIC = b"WRIX"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxQ")
+DIGEST_SIZE = 32
+
+
+def write_index(student_hashes: Iterable[str], path: str) -> Optional[int]:
+    """Пишет отсортированный индекс хешей; None, если хеши не 64-символьный hex"""
+    try:
+        digests = sorted({bytes.fromhex(student_hash) for student_hash in student_hashes})
+    except ValueError:
+        return None
+    if any(len(digest) != DIGEST_SIZE for digest in digests):
+        return None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(digests)))
+        f.write(b"".join(digests))
+    os.replace(tmp_file, path)
+    return len(digests)
+
+
+class RosterIndex:
+    """Множество хешей студбилетов поверх mmap: процессы читают одни и те же страницы.
+
+    Отвечает только на вопрос «есть ли такой номер»; статусы и занятие номера
+    остаются у процесса-владельца базы.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._mapped)
+        if (magic, version) != (MAGIC, VERSION) or len(self._mapped) != HEADER.size + count * DIGEST_SIZE:
+            self._mapped.close()
+            raise ValueError(f"Поврежденный индекс {path}")
+        self.count = count
+
+    @classmethod
+    def open(cls, path: str) -> Optional["RosterIndex"]:
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, student_hash: str) -> bool:
+        try:
+            digest = bytes.fromhex(student_hash)
+        except ValueError:
+            return False
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * DIGEST_SIZE
+            current = self._mapped[offset:offset + DIGEST_SIZE]
+            if current < digest:
+                lo = mid + 1
+            elif current > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        self._mapped.close()
@@ -1,18 +1,264 @@
+import asyncio
 import json
+import logging
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, date, timedelta, timezone
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from utils.compiled_schedule import PAIR_FIELDS, read_compiled, write_compiled
+from utils.lazy import LazyService
+from utils.lesson_index import LessonIndex, LessonSlot, clock, moment, moment_of
+from utils.metrics import metrics
 
 MOSCOW_TZ = timezone(timedelta(hours=3))
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+WEEKDAY_TITLES = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+DEFAULT_SEMESTER_WEEKS = 26
+SEPARATOR = "━━━━━━━━━━━━━━━━━━━━\n"
+GROUP_NAME_RE = re.compile(r"^[\w-]{1,32}$")
 
+logger = logging.getLogger(__name__)
 
-class ScheduleManager:
-    def __init__(self, schedule_file: str = "data/schedule.json"):
-        self.schedule_file = schedule_file
-        self.schedule_data = self._load_schedule()
+
+def validate_schedule(schedule_data: Dict) -> None:
+    """Проверяет структуру расписания, выбрасывает ValueError при ошибке"""
+    if not isinstance(schedule_data, dict):
+        raise ValueError("Корень расписания должен быть объектом")
+    days: Dict[str, List] = {}
+    for key in ("odd_week", "even_week", "special_dates"):
+        section = schedule_data.get(key, {})
+        if not isinstance(section, dict):
+            raise ValueError(f"Раздел '{key}' должен быть объектом")
+        days.update((f"{key}.{day}", lessons) for day, lessons in section.items())
+    for day, lessons in days.items():
+        if not isinstance(lessons, list):
+            raise ValueError(f"Пары для '{day}' должны быть списком")
+        for pair in lessons:
+            missing = [field for field in PAIR_FIELDS if field not in pair]
+            if missing:
+                raise ValueError(f"В паре для '{day}' нет полей: {', '.join(missing)}")
+
+
+class ScheduleIndex:
+    """Неизменяемый снимок расписания с заранее отрисованными сообщениями на семестр"""
+
+    def __init__(self, schedule_data: Dict, fallback_cache_size: int = 256, week_cache_size: int = 64):
+        self.schedule_data = schedule_data
+        self.special_dates = schedule_data.get("special_dates", {})
         self.start_date = datetime.strptime(
-            self.schedule_data.get("start_date", "2025-09-01"), "%Y-%m-%d"
+            schedule_data.get("start_date", "2025-09-01"), "%Y-%m-%d"
         ).date()
+        if "end_date" in schedule_data:
+            self.end_date = datetime.strptime(schedule_data["end_date"], "%Y-%m-%d").date()
+        else:
+            self.end_date = self.start_date + timedelta(weeks=DEFAULT_SEMESTER_WEEKS)
+        self.render_fallback = lru_cache(maxsize=fallback_cache_size)(self.render)
+        self.messages: Dict[date, str] = {}
+        self.messages_by_text: Dict[str, str] = {}
+        # Недельные сводки рисуются по первому запросу; ключ — (ISO-год, ISO-неделя).
+        # Индекс пересоздается при перезагрузке файла, вместе с ним сбрасывается и кеш.
+        self.week_cache_size = week_cache_size
+        self.week_messages: Dict[Tuple[int, int], str] = {}
+        self._precompute()
+
+    def _precompute(self):
+        dates = [
+            self.start_date + timedelta(days=i)
+            for i in range((self.end_date - self.start_date).days + 1)
+        ]
+        dates.extend(
+            datetime.strptime(date_str, "%Y-%m-%d").date() for date_str in self.special_dates
+        )
+        for target_date in dates:
+            message = self.render(target_date)
+            self.messages[target_date] = message
+            self.messages_by_text[target_date.strftime("%d.%m.%Y")] = message
+        # Время пар разбирается один раз; дальше /next, /days и поиск по аудитории — bisect
+        self.lessons = LessonIndex((day, self.day_schedule(day)) for day in sorted(set(dates)))
+
+    def week_type(self, target_date: date) -> str:
+        delta_days = (target_date - self.start_date).days
+        week_num = (delta_days // 7) + 1
+        return "odd" if week_num % 2 == 1 else "even"
+
+    def day_schedule(self, target_date: date) -> List[Dict]:
+        date_str = target_date.strftime("%Y-%m-%d")
+        if date_str in self.special_dates:
+            return self.special_dates[date_str]
+        day_name = WEEKDAYS[target_date.weekday()]
+        week_type = self.week_type(target_date)
+        return self.schedule_data.get(f"{week_type}_week", {}).get(day_name, [])
+
+    def render(self, target_date: date) -> str:
+        return self.format(self.day_schedule(target_date), target_date)
+
+    def format(self, schedule: List[Dict], target_date: date) -> str:
+        date_str = target_date.strftime("%d.%m.%Y (%A)")
+        week_type_text = "нечётная" if self.week_type(target_date) == "odd" else "чётная"
+        if not schedule:
+            return f"📅 {date_str}\nПар нет 🎉\n({week_type_text} неделя)"
+        pairs = [self.format_pair(pair) for pair in schedule]
+        return f"📅 Расписание на {date_str}\n🗓 {week_type_text} неделя\n\n" + SEPARATOR.join(pairs)
+
+    @staticmethod
+    def format_pair(pair: Dict) -> str:
+        return (
+            f"🕒 {pair['time']}\n"
+            f"📘 {pair['subject']}\n"
+            f"🎓 {pair['type']}\n"
+            f"🏫 {pair['room']}\n"
+            f"👨‍🏫 {pair['teacher']}\n"
+        )
+
+    @staticmethod
+    def format_day_block(day: date, lessons: List[Dict]) -> str:
+        """Компактный список пар дня для недельных и многодневных сводок"""
+        pairs = "".join(
+            f"🕒 {pair['time']} — {pair['subject']} ({pair['type']}), {pair['room']}\n"
+            for pair in lessons
+        )
+        return f"📌 {WEEKDAY_TITLES[day.weekday()]}, {day.strftime('%d.%m')}\n{pairs}"
+
+    def message_for(self, target_date: date) -> str:
+        message = self.messages.get(target_date)
+        if message is None:
+            metrics.cache_requests.inc("schedule", "miss")
+            return self.render_fallback(target_date)
+        metrics.cache_requests.inc("schedule", "hit")
+        return message
+
+    def render_week(self, monday: date) -> str:
+        sunday = monday + timedelta(days=6)
+        week_type_text = "нечётная" if self.week_type(monday) == "odd" else "чётная"
+        header = (
+            f"🗓 Неделя {monday.strftime('%d.%m')}–{sunday.strftime('%d.%m.%Y')}"
+            f" ({week_type_text})\n\n"
+        )
+        days = []
+        for offset in range(7):
+            current_day = monday + timedelta(days=offset)
+            schedule = self.day_schedule(current_day)
+            if schedule:
+                days.append(self.format_day_block(current_day, schedule))
+        if not days:
+            return header + "Пар нет 🎉"
+        return header + SEPARATOR.join(days)
+
+    def week_message_for(self, target_date: date) -> str:
+        """Сводка за ISO-неделю, в которую попадает target_date"""
+        key = tuple(target_date.isocalendar()[:2])
+        message = self.week_messages.get(key)
+        if message is not None:
+            metrics.cache_requests.inc("week", "hit")
+            return message
+        metrics.cache_requests.inc("week", "miss")
+        message = self.render_week(target_date - timedelta(days=target_date.weekday()))
+        if len(self.week_messages) < self.week_cache_size:
+            self.week_messages[key] = message
+        return message
+
+    def _slot_when(self, slot: LessonSlot, now: datetime) -> str:
+        if slot.day == now.date():
+            return "сегодня"
+        if slot.day == now.date() + timedelta(days=1):
+            return "завтра"
+        return f"{WEEKDAY_TITLES[slot.day.weekday()].lower()}, {slot.day.strftime('%d.%m')}"
+
+    def next_message(self, now: datetime) -> str:
+        """Идущая сейчас пара (если есть) и следующая за ней"""
+        at = moment_of(now)
+        current = self.lessons.all.current(at)
+        upcoming = self.lessons.all.after(at)
+        parts = []
+        if current is not None:
+            parts.append("⏳ Сейчас идет пара:\n" + self.format_pair(current.lesson))
+        if upcoming:
+            slot = upcoming[0]
+            parts.append(f"➡️ Следующая пара ({self._slot_when(slot, now)}):\n" + self.format_pair(slot.lesson))
+        if not parts:
+            return "🎉 Пар больше нет до конца семестра"
+        return "\n".join(parts)
+
+    def days_message(self, first_day: date, days: int) -> str:
+        """Пары на days дней начиная с first_day"""
+        last_day = first_day + timedelta(days=days - 1)
+        slots = self.lessons.all.between(moment(first_day), moment(last_day + timedelta(days=1)))
+        header = f"📅 Пары на {first_day.strftime('%d.%m')}–{last_day.strftime('%d.%m.%Y')}\n\n"
+        if not slots:
+            return header + "Пар нет 🎉"
+        by_day: Dict[date, List[Dict]] = OrderedDict()
+        for slot in slots:
+            by_day.setdefault(slot.day, []).append(slot.lesson)
+        return header + SEPARATOR.join(self.format_day_block(day, lessons) for day, lessons in by_day.items())
+
+    def _slots_text(self, slots: List[LessonSlot], now: datetime, detail: str) -> str:
+        return "".join(
+            f"• {self._slot_when(slot, now)}, {slot.lesson['time']} — {slot.lesson['subject']}"
+            f" ({slot.lesson[detail]})\n"
+            for slot in slots
+        )
+
+    def room_message(self, room: str, now: datetime, limit: int = 5) -> str:
+        """Занята ли аудитория сейчас и ближайшие пары в ней"""
+        index = self.lessons.room(room)
+        if index is None:
+            return f"🏫 В расписании нет пар в аудитории {room}"
+        at = moment_of(now)
+        current = index.current(at)
+        upcoming = index.after(at, limit)
+        if current is not None:
+            status = f"🔴 Аудитория {room} занята до {clock(current.end)}: {current.lesson['subject']}"
+        elif upcoming and upcoming[0].day == now.date():
+            status = f"🟢 Аудитория {room} свободна до {clock(upcoming[0].start)}"
+        else:
+            status = f"🟢 Аудитория {room} сегодня больше не занята"
+        if not upcoming:
+            return status
+        return f"{status}\n\nБлижайшие пары:\n" + self._slots_text(upcoming, now, "teacher")
+
+    def teacher_message(self, query: str, now: datetime, limit: int = 5) -> str:
+        """Ближайшие пары преподавателя (поиск по началу фамилии)"""
+        matches = self.lessons.teacher(query)
+        if not matches:
+            return f"👨‍🏫 Преподаватель «{query}» не найден в расписании"
+        if len(matches) > 1:
+            names = ", ".join(sorted(index.slots[0].lesson["teacher"] for _, index in matches))
+            return f"👨‍🏫 Найдено несколько преподавателей: {names}. Уточни запрос"
+        _, index = matches[0]
+        at = moment_of(now)
+        teacher = index.slots[0].lesson["teacher"]
+        upcoming = index.after(at, limit)
+        current = index.current(at)
+        lines = [f"👨‍🏫 {teacher}"]
+        if current is not None:
+            lines.append(f"Сейчас: {current.lesson['subject']}, ауд. {current.lesson['room']}")
+        if not upcoming:
+            lines.append("Пар больше нет до конца семестра")
+            return "\n".join(lines)
+        return "\n".join(lines) + "\n\nБлижайшие пары:\n" + self._slots_text(upcoming, now, "room")
+
+
+class GroupSchedule:
+    """Расписание одной группы из одного JSON-файла"""
+
+    def __init__(self, schedule_file: str = "data/schedule.json"):
+        self.schedule_file = schedule_file
+        self.last_used = time.monotonic()
+        self._reload_lock = threading.Lock()
+        self._mtime = self._stat_mtime()
+        self._index = self._build_index()
+
+    @property
+    def schedule_data(self) -> Dict:
+        return self._index.schedule_data
+
+    @property
+    def start_date(self) -> date:
+        return self._index.start_date
 
     def _load_schedule(self) -> Dict:
         if not os.path.exists(self.schedule_file):
@@ -20,38 +266,72 @@ class ScheduleManager:
         with open(self.schedule_file, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    def _stat_mtime(self) -> float:
+        try:
+            return os.stat(self.schedule_file).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _build_index(self) -> ScheduleIndex:
+        """Берет скомпилированный кеш рядом с JSON; при его отсутствии или устаревании
+        разбирает JSON, проверяет и пересобирает кеш"""
+        try:
+            source = os.stat(self.schedule_file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Файл {self.schedule_file} не найден.") from None
+        schedule_data = read_compiled(self.schedule_file, source)
+        if schedule_data is None:
+            schedule_data = self._load_schedule()
+            validate_schedule(schedule_data)
+            schedule_data = write_compiled(self.schedule_file, schedule_data, source)
+        return ScheduleIndex(schedule_data)
+
+    def reload_if_changed(self) -> bool:
+        """Перечитывает расписание при изменении файла; при ошибке оставляет старую версию"""
+        with self._reload_lock:
+            mtime = self._stat_mtime()
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                index = self._build_index()
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Расписание %s не обновлено: %s", self.schedule_file, e)
+                return False
+            # Присваивание атомарно: запросы видят либо старый, либо новый индекс целиком
+            self._index = index
+            logger.info("Расписание %s перезагружено", self.schedule_file)
+            return True
+
     def get_week_type(self, target_date: date = None) -> str:
         if target_date is None:
             target_date = datetime.now(MOSCOW_TZ).date()
-        delta_days = (target_date - self.start_date).days
-        week_num = (delta_days // 7) + 1
-        return "odd" if week_num % 2 == 1 else "even"
+        return self._index.week_type(target_date)
 
     def get_day_schedule(self, target_date: date) -> List[Dict]:
-        date_str = target_date.strftime("%Y-%m-%d")
-        if date_str in self.schedule_data.get("special_dates", {}):
-            return self.schedule_data["special_dates"][date_str]
-        day_name = target_date.strftime("%A").lower()
-        week_type = self.get_week_type(target_date)
-        return self.schedule_data.get(f"{week_type}_week", {}).get(day_name, [])
+        return self._index.day_schedule(target_date)
 
     def get_schedule_for_date(self, date_str: str) -> str:
+        message = self._index.messages_by_text.get(date_str)
+        if message is not None:
+            metrics.cache_requests.inc("schedule", "hit")
+            return message
         try:
             target_date = datetime.strptime(date_str, "%d.%m.%Y").date()
         except ValueError:
             return "⚠️ Неверный формат даты. Используй формат: 31.10.2025"
-        schedule = self.get_day_schedule(target_date)
-        return self.format_schedule(schedule, target_date)
+        return self._index.message_for(target_date)
+
+    def get_schedule_for_day(self, target_date: date) -> str:
+        return self._index.message_for(target_date)
 
     def get_today_schedule(self) -> str:
         today = datetime.now(MOSCOW_TZ).date()
-        schedule = self.get_day_schedule(today)
-        return self.format_schedule(schedule, today)
+        return self._index.message_for(today)
 
     def get_tomorrow_schedule(self) -> str:
         tomorrow = (datetime.now(MOSCOW_TZ) + timedelta(days=1)).date()
-        schedule = self.get_day_schedule(tomorrow)
-        return self.format_schedule(schedule, tomorrow)
+        return self._index.message_for(tomorrow)
 
     def get_week_schedule(self) -> Dict[str, List[Dict]]:
         week_schedule = {}
@@ -65,23 +345,156 @@ class ScheduleManager:
                 week_schedule[day] = schedule
         return week_schedule
 
+    def get_week_message(self, target_date: date = None) -> str:
+        if target_date is None:
+            target_date = datetime.now(MOSCOW_TZ).date()
+        return self._index.week_message_for(target_date)
+
+    def get_next_message(self, now: datetime = None) -> str:
+        return self._index.next_message(now or datetime.now(MOSCOW_TZ))
+
+    def get_days_message(self, days: int, first_day: date = None) -> str:
+        return self._index.days_message(first_day or datetime.now(MOSCOW_TZ).date(), days)
+
+    def get_room_message(self, room: str, now: datetime = None) -> str:
+        return self._index.room_message(room, now or datetime.now(MOSCOW_TZ))
+
+    def get_teacher_message(self, query: str, now: datetime = None) -> str:
+        return self._index.teacher_message(query, now or datetime.now(MOSCOW_TZ))
+
     def format_schedule(self, schedule: List[Dict], target_date: date) -> str:
-        date_str = target_date.strftime("%d.%m.%Y (%A)")
-        week_type_text = "нечётная" if self.get_week_type(target_date) == "odd" else "чётная"
-        if not schedule:
-            return f"📅 {date_str}\nПар нет 🎉\n({week_type_text} неделя)"
-        msg = f"📅 Расписание на {date_str}\n🗓 {week_type_text} неделя\n\n"
-        for i, pair in enumerate(schedule, 1):
-            msg += (
-                f"🕒 {pair['time']}\n"
-                f"📘 {pair['subject']}\n"
-                f"🎓 {pair['type']}\n"
-                f"🏫 {pair['room']}\n"
-                f"👨‍🏫 {pair['teacher']}\n"
-            )
-            if i < len(schedule):
-                msg += "━━━━━━━━━━━━━━━━━━━━\n"
-        return msg
-
-
-schedule_manager = ScheduleManager()
+        return self._index.format(schedule, target_date)
+
+
+class ScheduleManager:
+    """Расписание по умолчанию плюс расписания групп из data/schedules/<группа>.json.
+
+    Расписания групп загружаются при первом запросе и вытесняются по LRU,
+    когда загружено больше max_loaded_groups или группа простаивает дольше
+    idle_ttl секунд.
+    """
+
+    def __init__(
+        self,
+        schedule_file: str = "data/schedule.json",
+        groups_dir: str = "data/schedules",
+        max_loaded_groups: int = 64,
+        idle_ttl: float = 3600.0,
+    ):
+        self.schedule_file = schedule_file
+        self.groups_dir = groups_dir
+        self.max_loaded_groups = max_loaded_groups
+        self.idle_ttl = idle_ttl
+        self.default = GroupSchedule(schedule_file)
+        self._groups: "OrderedDict[str, GroupSchedule]" = OrderedDict()
+        self._groups_lock = threading.Lock()
+
+    def _group_file(self, group: str) -> str:
+        return os.path.join(self.groups_dir, f"{group}.json")
+
+    def has_group(self, group: str) -> bool:
+        return bool(GROUP_NAME_RE.match(group)) and os.path.exists(self._group_file(group))
+
+    def get_group(self, group: Optional[str] = None) -> GroupSchedule:
+        """Возвращает расписание группы, загружая его при первом обращении"""
+        if not group:
+            return self.default
+        with self._groups_lock:
+            schedule = self._groups.get(group)
+            if schedule is not None:
+                self._groups.move_to_end(group)
+                schedule.last_used = time.monotonic()
+                return schedule
+        if not self.has_group(group):
+            raise KeyError(group)
+        schedule = GroupSchedule(self._group_file(group))
+        with self._groups_lock:
+            schedule = self._groups.setdefault(group, schedule)
+            self._groups.move_to_end(group)
+            while len(self._groups) > self.max_loaded_groups:
+                self._groups.popitem(last=False)
+        return schedule
+
+    def is_loaded(self, group: str) -> bool:
+        return group in self._groups
+
+    def loaded_groups(self) -> List[str]:
+        with self._groups_lock:
+            return list(self._groups)
+
+    def evict_idle(self) -> int:
+        """Выгружает группы, к которым давно не обращались"""
+        threshold = time.monotonic() - self.idle_ttl
+        with self._groups_lock:
+            idle = [group for group, schedule in self._groups.items() if schedule.last_used < threshold]
+            for group in idle:
+                del self._groups[group]
+        return len(idle)
+
+    def reload_if_changed(self) -> bool:
+        """Перезагружает измененные файлы расписаний, уже находящиеся в памяти"""
+        with self._groups_lock:
+            schedules = [self.default] + list(self._groups.values())
+        reloaded = [schedule.reload_if_changed() for schedule in schedules]
+        self.evict_idle()
+        return any(reloaded)
+
+    async def watch(self, interval: float = 5.0):
+        """Фоновая задача: опрашивает mtime файлов и перезагружает расписания вне цикла событий"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.reload_if_changed)
+            except Exception:
+                logger.exception("Ошибка при проверке расписаний")
+
+    @property
+    def schedule_data(self) -> Dict:
+        return self.default.schedule_data
+
+    @property
+    def start_date(self) -> date:
+        return self.default.start_date
+
+    def get_week_type(self, target_date: date = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_week_type(target_date)
+
+    def get_day_schedule(self, target_date: date, group: Optional[str] = None) -> List[Dict]:
+        return self.get_group(group).get_day_schedule(target_date)
+
+    def get_schedule_for_date(self, date_str: str, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_schedule_for_date(date_str)
+
+    def get_schedule_for_day(self, target_date: date, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_schedule_for_day(target_date)
+
+    def get_today_schedule(self, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_today_schedule()
+
+    def get_tomorrow_schedule(self, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_tomorrow_schedule()
+
+    def get_week_schedule(self, group: Optional[str] = None) -> Dict[str, List[Dict]]:
+        return self.get_group(group).get_week_schedule()
+
+    def get_week_message(self, target_date: date = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_week_message(target_date)
+
+    def get_next_message(self, now: datetime = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_next_message(now)
+
+    def get_days_message(self, days: int, first_day: date = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_days_message(days, first_day)
+
+    def get_room_message(self, room: str, now: datetime = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_room_message(room, now)
+
+    def get_teacher_message(self, query: str, now: datetime = None, group: Optional[str] = None) -> str:
+        return self.get_group(group).get_teacher_message(query, now)
+
+    def format_schedule(self, schedule: List[Dict], target_date: date, group: Optional[str] = None) -> str:
+        return self.get_group(group).format_schedule(schedule, target_date)
+
+
+schedule_manager = LazyService("schedule_manager", ScheduleManager)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# utils/startup.py
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+from database import db
+from utils.lazy import LazyService
+from utils.logger import logger
+from utils.schedule_manager import schedule_manager
+
+SERVICES: List[LazyService] = [db, logger, schedule_manager]
+# Модули в порядке зависимостей: время каждого включает импорт его зависимостей
+PROFILED_IMPORTS = (
+    "telegram.ext",
+    "config",
+    "database",
+    "utils.logger",
+    "utils.schedule_manager",
+    "handlers.auth",
+    "bot",
+)
+
+
+async def start_services(services: List[LazyService] = SERVICES) -> Dict[str, float]:
+    """Параллельно создает сервисы в пуле потоков; возвращает время инициализации каждого"""
+    loop = asyncio.get_running_loop()
+    timings = await asyncio.gather(*(loop.run_in_executor(None, service.start) for service in services))
+    return {service.name: seconds for service, seconds in zip(services, timings)}
+
+
+def measure_import(module: str) -> float:
+    """Время импорта модуля в чистом интерпретаторе, в секундах"""
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); started = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started)"
+    )
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", code, repo_root], capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def profile_startup() -> str:
+    """Отчет для python bot.py --profile-startup: импорт и инициализация по компонентам"""
+    imports: List[Tuple[str, float]] = [(module, measure_import(module)) for module in PROFILED_IMPORTS]
+
+    started = time.perf_counter()
+    timings = asyncio.run(start_services())
+    total = time.perf_counter() - started
+
+    width = max(len(name) for name in PROFILED_IMPORTS)
+    lines = ["Импорт (отдельный процесс, вместе с зависимостями):"]
+    lines += [f"  {module:<{width}}  {seconds * 1000:8.1f} мс" for module, seconds in imports]
+    lines.append("Инициализация сервисов (параллельно):")
+    lines += [f"  {name:<{width}}  {seconds * 1000:8.1f} мс" for name, seconds in timings.items()]
+    lines.append(f"Готовность к ответам через {total * 1000:.1f} мс после импорта")
+    return "\n".join(lines)
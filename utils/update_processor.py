@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# utils/update_processor.py
+
+import asyncio
+from typing import Awaitable, Dict, List, Optional
+from telegram import __version_info__ as PTB_VERSION
+from telegram.ext import BaseUpdateProcessor
+
+# Мажорная версия python-telegram-bot, с которой сверено переопределение process_update
+# (в requirements.txt закреплена 20.7)
+SUPPORTED_PTB_MAJOR = 20
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает обновления разных чатов параллельно, а одного чата — по порядку.
+
+    Ожидание очереди своего чата происходит до захвата общего семафора, поэтому
+    поток сообщений из одного чата не занимает слоты, нужные остальным.
+
+    Для этого намеренно переопределен process_update, который в PTB помечен @final:
+    в do_process_update замок чата брался бы уже внутри семафора. Переопределение
+    опирается только на то, что базовый process_update захватывает семафор и
+    вызывает do_process_update; это сверено с PTB 20.x, и другая мажорная версия
+    отвергается при создании процессора, а не ломается молча.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        if PTB_VERSION[0] != SUPPORTED_PTB_MAJOR:
+            raise RuntimeError(
+                f"PerChatUpdateProcessor переопределяет process_update и проверен с "
+                f"python-telegram-bot {SUPPORTED_PTB_MAJOR}.x, установлена "
+                f"{'.'.join(map(str, PTB_VERSION[:3]))}: сверь BaseUpdateProcessor и обнови проверку"
+            )
+        super().__init__(max_concurrent_updates)
+        # ключ чата -> [замок, число ожидающих и выполняемых обновлений]
+        self._chat_locks: Dict[int, List] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(update, "effective_user", None)
+        return user.id if user is not None else None
+
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:  # type: ignore[misc]
+        key = self._chat_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# utils/workers.py
+"""Режим нескольких процессов: фронт принимает webhook и раздает обновления рабочим.
+
+Фронт (родительский процесс):
+- поднимает HTTP-эндпоинт webhook и отправляет тело обновления рабочему
+  user_id % WORKERS, так что один пользователь всегда попадает в один процесс;
+- владеет базой студбилетов: все операции, меняющие статус номера, идут через
+  него по очереди, поэтому занятие номера сериализовано;
+- перед запуском рабочих строит индекс хешей (data/roster.idx) и
+  скомпилированный кеш расписания.
+
+Общим в памяти через mmap остается только индекс хешей. Кеш расписания
+избавляет рабочего лишь от разбора JSON: пары и готовые сообщения каждый
+рабочий держит у себя, так что расписание занимает память в каждом процессе.
+Общие таблицы расписания без копирования в этот режим не входят: индексы
+/next, /room и недели строятся из объектов пар, и их пришлось бы перевести
+на чтение из mmap, а горячую перезагрузку — на замену отображения во всех
+рабочих сразу.
+Индекс хешей строится при каждом запуске фронта; номера меняет только
+roster.py, которому нужен остановленный бот, поэтому индекс не устаревает.
+
+Рабочий — обычное Application из bot.py без Updater: получает обновления из
+очереди, user_data хранит в своем файле, журнал — в data/logs/worker-<номер>.
+Лимиты Bot API (общий и на группу) делятся между рабочими поровну: сообщения
+одной группы от разных пользователей попадают в разные процессы.
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.handoff import READY_ENV, STATE_FILE, clear_state, wait_for_predecessor, write_state
+from utils.hashing import hash_student_id
+
+logger = logging.getLogger(__name__)
+
+# Методы базы, которые рабочий может вызвать у владельца
+OWNER_METHODS = ("authenticate_student", "is_student_exists", "release_student", "get_student_count")
+
+
+def routing_key(payload: Dict) -> int:
+    """user_id отправителя обновления; для обновлений без пользователя — id чата или update_id"""
+    for value in payload.values():
+        if isinstance(value, dict):
+            for field in ("from", "user", "chat"):
+                ident = value.get(field)
+                if isinstance(ident, dict) and "id" in ident:
+                    return ident["id"]
+    return payload.get("update_id", 0)
+
+
+class OwnerClient:
+    """Замена db в рабочем процессе: наличие номера проверяется по общему mmap-индексу,
+    остальное отправляется владельцу базы и ждет ответа."""
+
+    def __init__(self, worker: int, requests, responses, roster_index=None, timeout: float = 30.0):
+        self.worker = worker
+        self.roster_index = roster_index
+        self.timeout = timeout
+        self._requests = requests
+        self._responses = responses
+        self._ids = itertools.count()
+        self._pending: Dict[int, concurrent.futures.Future] = {}
+        self._reader = threading.Thread(target=self._read_responses, name="owner-responses", daemon=True)
+        self._reader.start()
+
+    def _read_responses(self):
+        while True:
+            response = self._responses.get()
+            if response is None:
+                return
+            request_id, ok, value = response
+            future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _call(self, method: str, *args):
+        request_id = next(self._ids)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._pending[request_id] = future
+        self._requests.put((self.worker, request_id, method, args))
+        return future.result(self.timeout)
+
+    def _known(self, student_id: str) -> Optional[bool]:
+        """True/False по индексу; None, если индекса нет"""
+        if self.roster_index is None:
+            return None
+        return hash_student_id(student_id) in self.roster_index
+
+    def is_student_exists(self, student_id: str) -> bool:
+        known = self._known(student_id)
+        return self._call("is_student_exists", student_id) if known is None else known
+
+    def authenticate_student(self, student_id: str, user=None) -> Tuple[bool, str]:
+        # Опечатки и перебор номеров отсекаются локально, без обращения к владельцу
+        if self._known(student_id) is False:
+            return False, "Номер студбилета не найден"
+        return tuple(self._call("authenticate_student", student_id, user.to_dict() if user else None))
+
+    def release_student(self, student_id: str) -> bool:
+        return self._call("release_student", student_id)
+
+    def get_student_count(self) -> Tuple[int, int]:
+        return tuple(self._call("get_student_count"))
+
+    def close(self):
+        if self.roster_index is not None:
+            self.roster_index.close()
+
+
+def serve_owner(database, requests, responses: List) -> None:
+    """Поток фронта: выполняет запросы рабочих к базе по одному"""
+    from telegram import User
+
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        worker, request_id, method, args = request
+        try:
+            if method not in OWNER_METHODS:
+                raise ValueError(f"Метод {method} недоступен рабочим")
+            if method == "authenticate_student" and args[1] is not None:
+                args = (args[0], User.de_json(args[1], None))
+            result = (True, getattr(database, method)(*args))
+        except Exception as e:
+            logger.exception("Ошибка запроса %s от рабочего %s", method, worker)
+            result = (False, repr(e))
+        responses[worker].put((request_id,) + result)
+
+
+def worker_main(index: int, count: int, token: str, updates, requests, responses, request_factory=None) -> None:
+    """Точка входа рабочего процесса (запускается через spawn)"""
+    # Ctrl+C и SIGTERM (systemd, docker stop, timeout) получает вся группа процессов.
+    # Рабочих останавливает фронт маркером в очереди — после дообработки обновлений
+    # и сброса user_data и журнала
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    import config
+
+    config.API_OVERALL_RATE /= count
+    config.API_GROUP_RATE /= count
+    config.BROADCAST_BATCH_SIZE = max(1, config.BROADCAST_BATCH_SIZE // count)
+
+    import bot
+    from database import db
+    from utils.logger import UserLogger, logger as user_logger
+    from utils.roster_index import RosterIndex
+
+    db.replace(OwnerClient(index, requests, responses, RosterIndex.open(config.ROSTER_INDEX_FILE)))
+    user_logger.replace(UserLogger(os.path.join("data", "logs", f"worker-{index}")))
+    request = request_factory() if request_factory else None
+    asyncio.run(_run_worker(bot, token, index, updates, request))
+
+
+async def _run_worker(bot, token: str, index: int, updates, request) -> None:
+    from telegram import Update
+    from config import PERSISTENCE_FILE
+
+    persistence_file = f"{PERSISTENCE_FILE}.{index}" if PERSISTENCE_FILE else None
+    app = bot.build_application(token, request=request, persistence_file=persistence_file)
+    loop = asyncio.get_running_loop()
+    async with app:
+        await bot.start_services()
+        await app.start()
+        # После start() задача отслеживается Application, и stop() ждет ее завершения,
+        # поэтому бесконечное наблюдение за файлом отменяется перед остановкой
+        watcher = None
+        if bot.SCHEDULE_RELOAD_INTERVAL > 0:
+            watcher = app.create_task(bot.schedule_manager.watch(bot.SCHEDULE_RELOAD_INTERVAL))
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            await app.update_queue.put(Update.de_json(json.loads(body), app.bot))
+        if watcher is not None:
+            watcher.cancel()
+        await app.stop()
+    bot.logger.info("Рабочий %s остановлен", index)
+
+
+async def _handle_webhook(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str, secret: Optional[str], route: Callable
+):
+    """Минимальный HTTP/1.1 с keep-alive: Telegram шлет только POST с JSON"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", "0"))
+            body = await reader.readexactly(length) if length else b""
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "POST" or parts[1].lstrip("/") != path:
+                status = "404 Not Found"
+            elif secret and headers.get("x-telegram-bot-api-secret-token") != secret:
+                status = "403 Forbidden"
+            else:
+                status = "200 OK" if route(body) else "400 Bad Request"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode("ascii"))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+def prepare_shared_data(database, roster_index_file: str) -> Optional[int]:
+    """Загружает базу во фронте и строит индекс хешей для рабочих"""
+    from utils.roster_index import write_index
+
+    database.start()
+    count = write_index((student_hash for student_hash, _ in database.iter_records()), roster_index_file)
+    if count is None:
+        logger.warning("Хеши базы не в формате hex — рабочие будут проверять номера через владельца")
+        if os.path.exists(roster_index_file):
+            os.remove(roster_index_file)
+    return count
+
+
+def run_front(token: str, count: int, request_factory=None) -> None:
+    """Запускает фронт и count рабочих процессов; работает до SIGTERM/SIGINT"""
+    import config
+    from database import db, lock_storage
+    from utils.persistence import repartition
+    from utils.schedule_manager import schedule_manager
+
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Расписание только читается: грузим (и пишем скомпилированный кеш для рабочих)
+    # до выхода старого процесса; базу и user_data — только после
+    schedule_manager.start()
+    wait_for_predecessor(code_dir)
+    if not lock_storage():
+        raise RuntimeError("❌ База студбилетов занята: идет roster.py import/rehash или запущен другой экземпляр бота")
+    db.require_current_scheme()
+    indexed = prepare_shared_data(db, config.ROSTER_INDEX_FILE)
+    logger.info("Индекс студбилетов для рабочих: %s записей", indexed)
+    if config.PERSISTENCE_FILE:
+        repartition(config.PERSISTENCE_FILE, count)
+
+    context = multiprocessing.get_context("spawn")
+    updates = [context.Queue() for _ in range(count)]
+    responses = [context.Queue() for _ in range(count)]
+    requests = context.Queue()
+    workers = [
+        context.Process(
+            target=worker_main,
+            args=(index, count, token, updates[index], requests, responses[index], request_factory),
+            name=f"wiseacre-worker-{index}",
+        )
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    owner = threading.Thread(target=serve_owner, args=(db, requests, responses), name="roster-owner", daemon=True)
+    owner.start()
+
+    def route(body: bytes) -> bool:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return False
+        updates[routing_key(payload) % count].put(body)
+        return True
+
+    try:
+        asyncio.run(_serve_front(token, route, code_dir, request_factory))
+    finally:
+        # Очереди FIFO: рабочие дообработают принятые обновления и выйдут
+        for queue in updates:
+            queue.put(None)
+        for worker in workers:
+            worker.join()
+        requests.put(None)
+        owner.join()
+        for queue in responses:
+            queue.put(None)
+        db.close()
+
+
+async def _serve_front(token: str, route: Callable, code_dir: str, request_factory=None) -> None:
+    from telegram import Bot
+    from config import WEBHOOK_LISTEN, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL
+
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_webhook(reader, writer, WEBHOOK_PATH, WEBHOOK_SECRET, route),
+        WEBHOOK_LISTEN,
+        WEBHOOK_PORT,
+    )
+    bot = Bot(token, request=request_factory() if request_factory else None)
+    async with bot:
+        await bot.set_webhook(f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET)
+
+    state = {"pid": os.getpid(), "code_dir": code_dir, "state": "serving"}
+    write_state(STATE_FILE, state)
+    ready_file = os.getenv(READY_ENV)
+    if ready_file:
+        write_state(ready_file, state)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        clear_state()